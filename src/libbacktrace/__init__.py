@@ -7,18 +7,24 @@ https://github.com/ianlancetaylor/libbacktrace
 
 from __future__ import annotations
 
+import functools
 import sys
-from dataclasses import dataclass
-from typing import List, Optional
+import threading
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
 __all__ = [
     "supported",
     "import_error",
     "get_backtrace",
+    "get_backtrace_pcs",
     "print_backtrace",
     "create_state",
+    "create_shared_state",
     "BacktraceFrame",
     "BacktraceState",
+    "Backtrace",
+    "RawBacktrace",
     # Fault handler (signal handler for crashes)
     "enable_faulthandler",
     "disable_faulthandler",
@@ -46,19 +52,55 @@ except Exception as e:
     _IMPORT_ERROR = f"{type(e).__name__}: {e}"
 
 
-@dataclass
-class BacktraceFrame:
-    """A single frame in a native stack trace."""
-    pc: int  # Program counter / instruction pointer
-    function: Optional[str]  # Function name (None if unknown)
-    filename: Optional[str]  # Source file path (None if unknown)
-    lineno: int  # Line number (0 if unknown)
-    
-    def __str__(self) -> str:
-        func = self.function or "??"
-        if self.filename:
-            return f"{func} at {self.filename}:{self.lineno}"
-        return f"{func} at 0x{self.pc:x}"
+if _SUPPORTED:
+    # Defined in C so backtrace_full() can build frames without a
+    # per-frame tuple; same fields, str() and equality as the fallback.
+    BacktraceFrame = _libbacktrace.BacktraceFrame
+else:
+    class BacktraceFrame:  # type: ignore[no-redef]
+        """A single frame in a native stack trace."""
+        
+        __slots__ = ("pc", "function", "filename", "lineno")
+        __match_args__ = __slots__
+        
+        def __init__(self, pc: int, function: Optional[str],
+                     filename: Optional[str], lineno: int):
+            self.pc = pc  # Program counter / instruction pointer
+            self.function = function  # Function name (None if unknown)
+            self.filename = filename  # Source file path (None if unknown)
+            self.lineno = lineno  # Line number (0 if unknown)
+        
+        def __repr__(self) -> str:
+            return (f"BacktraceFrame(pc={self.pc!r}, function={self.function!r}, "
+                    f"filename={self.filename!r}, lineno={self.lineno!r})")
+        
+        def __eq__(self, other: object) -> bool:
+            if not isinstance(other, BacktraceFrame):
+                return NotImplemented
+            return (self.pc, self.function, self.filename, self.lineno) == (
+                other.pc, other.function, other.filename, other.lineno)
+        
+        __hash__ = None  # type: ignore[assignment]  # mutable, like the C type
+        
+        def __reduce__(self):
+            return (type(self), (self.pc, self.function, self.filename, self.lineno))
+        
+        def __str__(self) -> str:
+            return _format_frame(self.pc, self.function, self.filename, self.lineno)
+        
+        def format_into(self, buf: bytearray) -> bytearray:
+            """Append str(self), UTF-8 encoded, to buf and return it."""
+            buf += str(self).encode()
+            return buf
+
+
+def _format_frame(pc: int, function: Optional[str], filename: Optional[str],
+                  lineno: int) -> str:
+    """Format one frame as shown by BacktraceFrame.__str__."""
+    func = function or "??"
+    if filename:
+        return f"{func} at {filename}:{lineno}"
+    return f"{func} at 0x{pc:x}"
 
 
 class BacktraceState:
@@ -69,17 +111,89 @@ class BacktraceState:
     making subsequent backtrace calls faster.
     """
     
-    def __init__(self, filename: Optional[str] = None, threaded: bool = True):
+    def __init__(self, filename: Optional[str] = None, threaded: bool = True,
+                 unwinder: str = "dwarf"):
         """
         Create a new backtrace state.
         
         Args:
             filename: Path to executable (None for current process)
             threaded: Whether to support multi-threaded access
+            unwinder: How to walk the stack: "dwarf" (default) uses the
+                      unwind tables and works everywhere; "fp" follows
+                      frame pointers, which is much faster but stops at the
+                      first frame compiled without -fno-omit-frame-pointer
+                      (it falls back to "dwarf" when that leaves no frames)
         """
         if not _SUPPORTED:
             raise RuntimeError("libbacktrace not supported on this platform")
-        self._state = _libbacktrace.create_state(filename, threaded)
+        self._state = _libbacktrace.create_state(filename, threaded, unwinder)
+    
+    def capture(self, skip: int = 0) -> RawBacktrace:
+        """
+        Capture the current native stack trace without resolving symbols.
+        
+        Only program counters are recorded; DWARF lookup is deferred until
+        the frames of the returned trace are first requested.
+        
+        Args:
+            skip: Number of frames to skip from the top
+            
+        Returns:
+            RawBacktrace object
+        """
+        pcs = array("Q")
+        pcs.frombytes(_libbacktrace.backtrace_simple(self._state, skip + 1))
+        return RawBacktrace(pcs, self)
+    
+    def capture_into(self, out: array, skip: int = 0) -> int:
+        """
+        Capture program counters into a pre-allocated buffer.
+        
+        Nothing is allocated per call, which suits periodic sampling.
+        Resolve the collected PCs later with resolve_batch().
+        
+        Args:
+            out: array('Q') (or other writable uint64 buffer) to fill
+            skip: Number of frames to skip from the top
+            
+        Returns:
+            Number of frames written; the remaining slots are zeroed
+        """
+        return _libbacktrace.backtrace_simple_into(self._state, skip + 1, out)
+    
+    def resolve(self, pcs: array) -> Backtrace:
+        """
+        Resolve program counters to frames with symbol information.
+        
+        Args:
+            pcs: Program counters, as captured by capture()
+            
+        Returns:
+            Backtrace object
+        """
+        pcs, functions, filenames, linenos = _libbacktrace.resolve(self._state, pcs)
+        return Backtrace(pcs, functions, filenames, linenos, self)
+    
+    def resolve_batch(self, pcs: array) -> List[Tuple[BacktraceFrame, ...]]:
+        """
+        Resolve a large set of program counters in one pass.
+        
+        Intended for profilers that collect PCs from many traces and
+        symbolize them at report time. PCs are sorted and de-duplicated
+        before lookup, so each distinct PC is resolved once and
+        neighbouring lookups share line-table data.
+        
+        Args:
+            pcs: Program counters as array('Q'), e.g. several traces'
+                 pcs concatenated
+            
+        Returns:
+            List in input order with one tuple of BacktraceFrame objects
+            per PC (more than one frame when the PC is in inlined code).
+            Repeated PCs share the same tuple.
+        """
+        return _libbacktrace.resolve_batch(self._state, pcs)
     
     def get_backtrace(self, skip: int = 0) -> List[BacktraceFrame]:
         """
@@ -91,23 +205,177 @@ class BacktraceState:
         Returns:
             List of BacktraceFrame objects
         """
-        raw_frames = _libbacktrace.backtrace_full(self._state, skip + 1)
-        return [
-            BacktraceFrame(pc=f[0], function=f[1], filename=f[2], lineno=f[3])
-            for f in raw_frames
-        ]
+        return _libbacktrace.backtrace_full(self._state, skip + 1)
+    
+    def _refresh_modules(self) -> bool:
+        """
+        Pick up shared libraries loaded or unloaded since the state read them.
+        
+        libbacktrace reads the list of loaded modules once, so code in a
+        library dlopen'd later resolves to unknown frames. Lookups already
+        refresh on demand, when a frame with no function falls outside
+        every known module; call this to refresh eagerly, e.g. right after
+        loading a plugin.
+        
+        Either way a refresh replaces the libbacktrace state, and
+        libbacktrace cannot free the old one: each refresh leaves its
+        debug information (often megabytes) behind. Code that keeps loading
+        libraries should expect memory to grow with every refresh.
+        
+        Returns:
+            True if the module list changed and cached symbols were dropped
+        """
+        return _libbacktrace.refresh_modules(self._state)
+    
+    def prewarm(self) -> int:
+        """
+        Load debug information for the program and all loaded libraries now.
+        
+        libbacktrace reads line tables and function information one
+        compilation unit at a time, when a lookup first lands in it. This
+        looks up an address every 256 bytes of each module's code, so
+        nearly every unit is read up front; only a unit smaller than that
+        may still load on first use. That can take tens of megabytes and a
+        noticeable fraction of a second. Call this in a server before
+        forking workers: the children inherit the populated state and
+        share its pages copy-on-write instead of each building their own.
+        
+        Returns:
+            Number of module code ranges visited
+        """
+        return _libbacktrace.prewarm(self._state)
 
 
-# Default global state (lazily initialized)
-_default_state: Optional[BacktraceState] = None
+class Backtrace:
+    """
+    A resolved native stack trace stored column-wise.
+    
+    Frame data lives in parallel arrays rather than one object per frame;
+    BacktraceFrame objects are only created when indexing or iterating.
+    """
+    
+    __slots__ = ("pcs", "functions", "filenames", "linenos", "_state")
+    
+    def __init__(self, pcs: array, functions: List[Optional[str]],
+                 filenames: List[Optional[str]], linenos: array,
+                 state: BacktraceState):
+        self.pcs = pcs  # array('Q')
+        self.functions = functions
+        self.filenames = filenames
+        self.linenos = linenos  # array('i')
+        self._state = state
+    
+    def __len__(self) -> int:
+        return len(self.pcs)
+    
+    def __getitem__(self, index: Union[int, slice]) -> Union[BacktraceFrame, "Backtrace"]:
+        if isinstance(index, slice):
+            return Backtrace(
+                self.pcs[index],
+                self.functions[index],
+                self.filenames[index],
+                self.linenos[index],
+                self._state,
+            )
+        return BacktraceFrame(
+            pc=self.pcs[index],
+            function=self.functions[index],
+            filename=self.filenames[index],
+            lineno=self.linenos[index],
+        )
+    
+    def __iter__(self) -> Iterator[BacktraceFrame]:
+        for pc, function, filename, lineno in zip(
+            self.pcs, self.functions, self.filenames, self.linenos
+        ):
+            yield BacktraceFrame(pc=pc, function=function, filename=filename, lineno=lineno)
+    
+    def __str__(self) -> str:
+        return "\n".join(
+            f"  #{i} {_format_frame(*frame)}"
+            for i, frame in enumerate(
+                zip(self.pcs, self.functions, self.filenames, self.linenos)
+            )
+        )
+
+
+class RawBacktrace:
+    """
+    A captured native stack trace whose symbols are resolved on demand.
+    
+    Holds only the program counters until frames() is called (directly,
+    by iterating, or by formatting the trace), so traces that are never
+    inspected never pay for symbol lookup.
+    """
+    
+    __slots__ = ("pcs", "_state", "_resolved")
+    
+    def __init__(self, pcs: array, state: BacktraceState):
+        self.pcs = pcs
+        self._state = state
+        self._resolved: Optional[Backtrace] = None
+    
+    def resolve(self) -> Backtrace:
+        """
+        Resolve (once) the symbols of this trace.
+        
+        Returns:
+            Backtrace object
+        """
+        if self._resolved is None:
+            self._resolved = self._state.resolve(self.pcs)
+        return self._resolved
+    
+    def frames(self) -> List[BacktraceFrame]:
+        """
+        Resolve and return the frames of this trace.
+        
+        Returns:
+            List of BacktraceFrame objects
+        """
+        return list(self.resolve())
+    
+    def __iter__(self) -> Iterator[BacktraceFrame]:
+        return iter(self.resolve())
+    
+    def __str__(self) -> str:
+        return str(self.resolve())
+
+
+_FORMAT_BUFFER_SIZE = 16384
+
+
+class _DefaultState(threading.local):
+    """
+    Per-thread default state and print_backtrace() buffer. Symbol lookups
+    run with the GIL released, and each thread gets its own single-threaded
+    state, so concurrent captures resolve in parallel without contending
+    on libbacktrace's internal synchronization. The price is that every
+    thread that resolves symbols loads its own copy of the debug tables.
+    When a thread exits, its state is kept and handed to the next new
+    thread, so memory tracks the number of live threads.
+    """
+    
+    def __getattr__(self, name: str):
+        # Only reached on a thread's first access; afterwards `state` and
+        # `buf` are plain attributes and lookups take no branch.
+        if name == "state":
+            value = BacktraceState(threaded=False)
+        elif name == "buf":
+            # Reused by print_backtrace(); grown by C when a trace needs more
+            value = bytearray(_FORMAT_BUFFER_SIZE)
+        else:
+            raise AttributeError(name)
+        setattr(self, name, value)
+        return value
+
+
+_tls = _DefaultState()
 
 
 def _get_default_state() -> BacktraceState:
-    """Get or create the default backtrace state."""
-    global _default_state
-    if _default_state is None:
-        _default_state = BacktraceState()
-    return _default_state
+    """Get or create the calling thread's default backtrace state."""
+    return _tls.state
 
 
 def supported() -> bool:
@@ -130,25 +398,54 @@ def import_error() -> Optional[str]:
     return _IMPORT_ERROR
 
 
-def create_state(filename: Optional[str] = None, threaded: bool = True) -> BacktraceState:
+def create_state(filename: Optional[str] = None, threaded: bool = True,
+                 unwinder: str = "dwarf") -> BacktraceState:
     """
     Create a new backtrace state for caching symbol information.
     
     Args:
         filename: Path to executable (None for current process)
         threaded: Whether to support multi-threaded access
+        unwinder: "dwarf" (default) or "fp" to walk frame pointers
         
     Returns:
         BacktraceState object
     """
-    return BacktraceState(filename, threaded)
+    return BacktraceState(filename, threaded, unwinder)
+
+
+def create_shared_state(filename: Optional[str] = None) -> BacktraceState:
+    """
+    Create a backtrace state that may be used from several threads.
+    
+    The module-level functions use a separate state per thread. Each of
+    those loads its own copy of the symbol tables on first use, so
+    programs that capture traces from many short-lived threads may prefer
+    one shared state instead.
+    
+    Args:
+        filename: Path to executable (None for current process)
+        
+    Returns:
+        BacktraceState object
+    """
+    return BacktraceState(filename, threaded=True)
+
+
+if _SUPPORTED:
+    # Hot path: resolve the extension function once, not per call
+    _backtrace_full = _libbacktrace.backtrace_full
+    _backtrace_simple = _libbacktrace.backtrace_simple
+    _backtrace_simple_into = _libbacktrace.backtrace_simple_into
+    _format_backtrace = _libbacktrace.format_backtrace
+    _format_backtrace_into = _libbacktrace.format_backtrace_into
 
 
 def get_backtrace(skip: int = 0) -> List[BacktraceFrame]:
     """
     Get the current native stack trace.
     
-    Uses a default shared state. For better performance in hot paths,
+    Uses a per-thread default state. For better performance in hot paths,
     create your own BacktraceState and reuse it.
     
     Args:
@@ -157,9 +454,33 @@ def get_backtrace(skip: int = 0) -> List[BacktraceFrame]:
     Returns:
         List of BacktraceFrame objects, or empty list if not supported
     """
-    if not _SUPPORTED:
-        return []
-    return _get_default_state().get_backtrace(skip + 1)
+    # +2: the call machinery that used to sit under the
+    # BacktraceState.get_backtrace() hop, so frame 0 is still the caller
+    return _backtrace_full(_tls.state._state, skip + 2)
+
+
+def get_backtrace_pcs(skip: int = 0, out: Optional[array] = None) -> array:
+    """
+    Get the current native stack trace as program counters only.
+    
+    No symbols are looked up. Pass a pre-allocated ``out`` buffer, such as
+    ``array('Q', bytes(8 * 128))``, to sample without allocating; the PCs
+    fill it from the start and the slots after the last frame are zeroed.
+    
+    Args:
+        skip: Number of frames to skip from the top
+        out: Optional array('Q') to fill in place
+        
+    Returns:
+        out if given, otherwise a new array('Q') holding just the frames
+    """
+    # Same offset as get_backtrace(), so PCs line up with its frames
+    if out is not None:
+        _backtrace_simple_into(_tls.state._state, skip + 2, out)
+        return out
+    pcs = array("Q")
+    pcs.frombytes(_backtrace_simple(_tls.state._state, skip + 2))
+    return pcs
 
 
 def print_backtrace(skip: int = 0, file=None) -> None:
@@ -171,20 +492,41 @@ def print_backtrace(skip: int = 0, file=None) -> None:
         file: File to print to (default: sys.stderr)
     """
     if file is None:
-        file = sys.stderr
+        file = sys.stderr  # Looked up per call: pytest's capsys rebinds it
+        if file is None:
+            return  # No stderr (e.g. pythonw), like print()
+    state = _tls.state._state
+    # Drop the call machinery under us, plus one frame as when this went
+    # through get_backtrace(skip + 1), so frame #0 is unchanged
+    skip += 3
     
-    frames = get_backtrace(skip + 1)
-    if not frames:
-        print("  (native backtrace not available)", file=file)
-        return
+    try:
+        fd = file.fileno()
+    except (AttributeError, OSError, ValueError):
+        fd = None
+    
+    if fd is not None:
+        # Format in C and emit with a single write(2) on the descriptor
+        file.flush()
+        if _format_backtrace(state, skip, fd):
+            return
+    else:
+        # No descriptor (e.g. StringIO): format in C into this thread's
+        # reusable buffer, then write once
+        buf = _tls.buf
+        n = _format_backtrace_into(state, skip, buf)
+        if n:
+            file.write(str(memoryview(buf)[:n], "utf-8", "replace"))
+            return
     
-    for i, frame in enumerate(frames):
-        print(f"  #{i} {frame}", file=file)
+    file.write("  (native backtrace not available)\n")
 
 
 # =============================================================================
 # Signal constants
 # =============================================================================
+# Names, kept as strings for compatibility; enable_faulthandler() also
+# accepts signal numbers such as signal.SIGSEGV.
 
 SIGSEGV = "SIGSEGV"
 SIGABRT = "SIGABRT"
@@ -206,8 +548,6 @@ def get_signals() -> List[str]:
     Returns:
         List of signal name strings (e.g., ["SIGSEGV", "SIGABRT", ...])
     """
-    if not _SUPPORTED:
-        return []
     return _libbacktrace.get_signals()
 
 
@@ -218,13 +558,11 @@ def get_default_signals() -> List[str]:
     Returns:
         List of signal name strings
     """
-    if not _SUPPORTED:
-        return []
     return _libbacktrace.get_default_signals()
 
 
 def enable_faulthandler(
-    signals: Optional[List[str]] = None,
+    signals: Optional[Iterable[Union[str, int]]] = None,
     report_path: Optional[str] = None
 ) -> bool:
     """
@@ -237,8 +575,13 @@ def enable_faulthandler(
     operable state. After calling this function, crashes will generate
     stack traces using only:
       - Async-signal-safe syscalls (write, open, close)
-      - Pre-allocated libbacktrace state
-      - Stack-allocated buffers (no malloc in handler)
+      - Pre-allocated libbacktrace state, with symbol tables loaded here
+      - Pre-allocated buffers (no malloc in handler)
+      - An alternate signal stack for the calling thread, so stack
+        overflows are reported too
+    
+    The raw program counters are written before any symbol lookup, so
+    they survive even if resolving symbols fails.
     
     This complements Python's built-in faulthandler module which only shows
     Python stack traces. For complete crash reports, enable both:
@@ -257,27 +600,23 @@ def enable_faulthandler(
         )
     
     Args:
-        signals: List of signal names to handle. Use get_signals() to see
-                 available options. Default: SIGSEGV, SIGABRT, SIGFPE, SIGBUS
+        signals: Signals to handle, as names (see get_signals()) or numbers
+                 such as signal.SIGSEGV. Default: SIGSEGV, SIGABRT, SIGFPE, SIGBUS
         report_path: Optional file path to save crash reports
         
     Returns:
         True if enabled successfully, False if not supported
     """
-    if not _SUPPORTED:
-        return False
     return _libbacktrace.enable_faulthandler(signals=signals, report_path=report_path)
 
 
 def disable_faulthandler() -> bool:
     """
-    Disable native crash handler and restore default signal handlers.
+    Disable native crash handler and restore the previous signal handlers.
     
     Returns:
         True if disabled successfully, False if not supported
     """
-    if not _SUPPORTED:
-        return False
     return _libbacktrace.disable_faulthandler()
 
 
@@ -288,6 +627,53 @@ def faulthandler_enabled() -> bool:
     Returns:
         True if crash handler is active
     """
-    if not _SUPPORTED:
-        return False
     return _libbacktrace.faulthandler_enabled()
+
+
+# =============================================================================
+# Fallbacks when the native extension is unavailable
+# =============================================================================
+# Chosen once at import, so the functions above never test _SUPPORTED.
+
+if not _SUPPORTED:
+    @functools.wraps(get_backtrace)
+    def get_backtrace(skip: int = 0) -> List[BacktraceFrame]:
+        return []
+    
+    @functools.wraps(get_backtrace_pcs)
+    def get_backtrace_pcs(skip: int = 0, out: Optional[array] = None) -> array:
+        if out is not None:
+            out[:] = array("Q", bytes(len(out) * out.itemsize))
+            return out
+        return array("Q")
+    
+    @functools.wraps(print_backtrace)
+    def print_backtrace(skip: int = 0, file=None) -> None:
+        if file is None:
+            file = sys.stderr
+            if file is None:
+                return
+        print("  (native backtrace not available)", file=file)
+    
+    @functools.wraps(get_signals)
+    def get_signals() -> List[str]:
+        return []
+    
+    @functools.wraps(get_default_signals)
+    def get_default_signals() -> List[str]:
+        return []
+    
+    @functools.wraps(enable_faulthandler)
+    def enable_faulthandler(
+        signals: Optional[Iterable[Union[str, int]]] = None,
+        report_path: Optional[str] = None
+    ) -> bool:
+        return False
+    
+    @functools.wraps(disable_faulthandler)
+    def disable_faulthandler() -> bool:
+        return False
+    
+    @functools.wraps(faulthandler_enabled)
+    def faulthandler_enabled() -> bool:
+        return False
@@ -11,8 +11,10 @@
  * will print stack traces using only:
  * 
  *   - Async-signal-safe syscalls: write(), open(), close(), getpid()
- *   - Pre-allocated libbacktrace state (created during enable_faulthandler)
- *   - Stack-allocated buffers (no malloc in signal handler)
+ *   - Pre-allocated libbacktrace state (created and warmed up during
+ *     enable_faulthandler)
+ *   - Pre-allocated PC and output buffers, and an alternate signal stack
+ *     (no malloc in signal handler)
  * 
  * Note: On macOS, libbacktrace itself uses malloc internally
  * (BACKTRACE_USES_MALLOC=1), which is technically not async-signal-safe.
@@ -23,6 +25,7 @@
 
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
+#include <structmember.h>
 #include <backtrace.h>
 #include <backtrace-supported.h>
 #include <signal.h>
@@ -30,150 +33,1776 @@
 #include <time.h>
 #include <unistd.h>
 #include <fcntl.h>
+#include <errno.h>
+#include <pthread.h>
+#if defined(__APPLE__)
+#include <mach-o/dyld.h>
+#include <mach-o/loader.h>
+#else
+#include <link.h>
+#endif
+
+/* Maximum frames to capture */
+#define MAX_FRAMES 128
+
+/* Frame data collected during backtrace */
+typedef struct {
+    uintptr_t pc;
+    const char *function;
+    const char *filename;
+    int lineno;
+} frame_data_t;
+
+/* Context for backtrace callback */
+typedef struct {
+    frame_data_t frames[MAX_FRAMES];
+    int count;
+} backtrace_context_t;
+
+/* Callback for each frame with full symbol info */
+static int full_callback(void *data, uintptr_t pc,
+                         const char *filename, int lineno,
+                         const char *function) {
+    backtrace_context_t *ctx = (backtrace_context_t *)data;
+    
+    if (ctx->count >= MAX_FRAMES) {
+        return 1;  /* Stop iteration */
+    }
+    
+    frame_data_t *frame = &ctx->frames[ctx->count++];
+    frame->pc = pc;
+    frame->function = function;
+    frame->filename = filename;
+    frame->lineno = lineno;
+    
+    return 0;
+}
+
+/* Error callback */
+static void error_callback(void *data, const char *msg, int errnum) {
+    (void)data;
+    (void)msg;
+    (void)errnum;
+    /* Silently ignore errors - we just won't have symbols */
+}
+
+/*
+ * Buffered output
+ * 
+ * Formats text into a caller-provided buffer and hands it to write(2) in
+ * as few calls as possible. Shared by format_backtrace() and the crash
+ * signal handler, so the descriptor path must stay async-signal-safe:
+ * no malloc, no stdio, no snprintf. Output can instead go into a
+ * bytearray (fd == -1), written at sink_pos and grown only when full;
+ * that path is never used from the signal handler. With size 0 there is
+ * no staging buffer and every write goes straight to the destination.
+ */
+
+#define OUTPUT_BUFFER_SIZE 16384
+
+typedef struct {
+    int fd;            /* Descriptor to write to, or -1 to append to sink */
+    PyObject *sink;    /* bytearray receiving output when fd is -1 */
+    Py_ssize_t sink_pos;  /* Offset of the next byte written to sink */
+    int failed;        /* Growing sink failed; a Python error is set */
+    size_t len;
+    size_t size;
+    char *data;
+} output_buffer_t;
+
+static void out_init(output_buffer_t *out, int fd, PyObject *sink,
+                     char *data, size_t size) {
+    out->fd = fd;
+    out->sink = sink;
+    out->sink_pos = sink ? PyByteArray_GET_SIZE(sink) : 0;  /* Append */
+    out->failed = 0;
+    out->len = 0;
+    out->size = size;
+    out->data = data;
+}
+
+/* write(2) all of [data, data + len), retrying on EINTR and short writes */
+static void write_all(int fd, const char *data, size_t len) {
+    while (len > 0) {
+        ssize_t n = write(fd, data, len);
+        if (n < 0) {
+            if (errno == EINTR) {
+                continue;
+            }
+            return;
+        }
+        data += n;
+        len -= (size_t)n;
+    }
+}
+
+/* Send bytes straight to the destination, bypassing the buffer */
+static void out_emit(output_buffer_t *out, const char *s, size_t len) {
+    if (out->fd >= 0) {
+        write_all(out->fd, s, len);
+        return;
+    }
+    if (out->failed || len == 0) {
+        return;
+    }
+    
+    Py_ssize_t end = out->sink_pos + (Py_ssize_t)len;
+    if (end > PyByteArray_GET_SIZE(out->sink) &&
+            PyByteArray_Resize(out->sink, end) < 0) {
+        out->failed = 1;
+        return;
+    }
+    memcpy(PyByteArray_AS_STRING(out->sink) + out->sink_pos, s, len);
+    out->sink_pos = end;
+}
+
+static void out_flush(output_buffer_t *out) {
+    out_emit(out, out->data, out->len);
+    out->len = 0;
+}
+
+static void out_write(output_buffer_t *out, const char *s, size_t len) {
+    if (len == 0) {
+        return;
+    }
+    if (out->len + len > out->size) {
+        out_flush(out);
+        if (len > out->size) {
+            out_emit(out, s, len);
+            return;
+        }
+    }
+    memcpy(out->data + out->len, s, len);
+    out->len += len;
+}
+
+static void out_str(output_buffer_t *out, const char *s) {
+    out_write(out, s, strlen(s));
+}
+
+static void out_dec(output_buffer_t *out, long value) {
+    char digits[24];
+    char *p = digits + sizeof(digits);
+    unsigned long v = value < 0 ? 0UL - (unsigned long)value : (unsigned long)value;
+    
+    do {
+        *--p = (char)('0' + v % 10);
+        v /= 10;
+    } while (v);
+    if (value < 0) {
+        *--p = '-';
+    }
+    out_write(out, p, (size_t)(digits + sizeof(digits) - p));
+}
+
+/* Write "0x" followed by lowercase hex digits */
+static void out_hex(output_buffer_t *out, uintptr_t value) {
+    char digits[2 + 2 * sizeof(uintptr_t)];
+    char *p = digits + sizeof(digits);
+    
+    do {
+        *--p = "0123456789abcdef"[value & 0xf];
+        value >>= 4;
+    } while (value);
+    *--p = 'x';
+    *--p = '0';
+    out_write(out, p, (size_t)(digits + sizeof(digits) - p));
+}
+
+/* Write "function at file:line", or "function at 0x<pc>" without a file */
+static void out_frame(output_buffer_t *out, uintptr_t pc, const char *function,
+                      const char *filename, int lineno) {
+    out_str(out, function && *function ? function : "??");
+    out_str(out, " at ");
+    if (filename && *filename) {
+        out_str(out, filename);
+        out_str(out, ":");
+        out_dec(out, lineno);
+    } else {
+        out_hex(out, pc);
+    }
+}
+
+/*
+ * Frame-pointer unwinder
+ * 
+ * For code built with -fno-omit-frame-pointer the stack is a linked list
+ * of (saved frame pointer, return address) pairs, which is far cheaper to
+ * walk than interpreting .eh_frame. Each step is validated: frame pointers
+ * must be aligned, stay inside the current thread's stack and strictly
+ * increase, so a frame without a frame pointer ends the walk instead of
+ * sending it into arbitrary memory. A walk that yields no frames is
+ * redone with DWARF unwinding (see capture_pcs()). Symbols still come
+ * from DWARF via backtrace_pcinfo().
+ */
+
+#if defined(__x86_64__) || defined(__aarch64__)
+#define HAVE_FP_UNWINDER 1
+#else
+#define HAVE_FP_UNWINDER 0
+#endif
+
+enum {
+    UNWINDER_DWARF = 0,
+    UNWINDER_FP = 1,
+};
+
+#if HAVE_FP_UNWINDER
+
+/* Get [lo, hi) of the calling thread's stack, cached per thread */
+static int thread_stack_bounds(uintptr_t *lo, uintptr_t *hi) {
+    static _Thread_local uintptr_t cached_lo = 0;
+    static _Thread_local uintptr_t cached_hi = 0;
+    
+    if (cached_hi == 0) {
+#if defined(__APPLE__)
+        pthread_t self = pthread_self();
+        cached_hi = (uintptr_t)pthread_get_stackaddr_np(self);
+        cached_lo = cached_hi - pthread_get_stacksize_np(self);
+#else
+        pthread_attr_t attr;
+        void *addr;
+        size_t size;
+        if (pthread_getattr_np(pthread_self(), &attr) != 0) {
+            return 0;
+        }
+        int rc = pthread_attr_getstack(&attr, &addr, &size);
+        pthread_attr_destroy(&attr);
+        if (rc != 0) {
+            return 0;
+        }
+        cached_lo = (uintptr_t)addr;
+        cached_hi = (uintptr_t)addr + size;
+#endif
+    }
+    
+    *lo = cached_lo;
+    *hi = cached_hi;
+    return 1;
+}
+
+/*
+ * Collect up to max PCs by following the frame-pointer chain. The first
+ * PC belongs to the caller of this function. Like libbacktrace, PCs are
+ * return addresses minus one so they fall inside the call instruction.
+ * Returns the number of PCs stored.
+ */
+__attribute__((noinline))
+static int unwind_fp(int skip, uint64_t *pcs, int max) {
+    uintptr_t lo, hi;
+    if (!thread_stack_bounds(&lo, &hi)) {
+        return 0;
+    }
+    
+    uintptr_t fp = (uintptr_t)__builtin_frame_address(0);
+    int count = 0;
+    
+    while (count < max) {
+        if (fp < lo || fp > hi - 2 * sizeof(uintptr_t) || fp % sizeof(uintptr_t) != 0) {
+            break;
+        }
+        
+        uintptr_t next = ((const uintptr_t *)fp)[0];
+        uintptr_t ret = ((const uintptr_t *)fp)[1];
+        if (ret == 0) {
+            break;
+        }
+        
+        if (skip > 0) {
+            skip--;
+        } else {
+            pcs[count++] = (uint64_t)(ret - 1);
+        }
+        
+        /* The stack grows down, so callers' frames are at higher addresses */
+        if (next <= fp) {
+            break;
+        }
+        fp = next;
+    }
+    
+    return count;
+}
+
+#else
+
+static int unwind_fp(int skip, uint64_t *pcs, int max) {
+    (void)skip;
+    (void)pcs;
+    (void)max;
+    return 0;
+}
+
+#endif /* HAVE_FP_UNWINDER */
+
+/*
+ * Loaded modules
+ * 
+ * Address ranges of the executable segments of the main program and every
+ * loaded shared library, read from the dynamic loader. Used to prewarm a
+ * state with one lookup per module, and kept sorted per state to notice
+ * PCs in libraries dlopen'd after the state read its modules.
+ */
+
+typedef struct {
+    uintptr_t lo;
+    uintptr_t hi;
+} module_range_t;
+
+typedef struct {
+    module_range_t *ranges;
+    int count;  /* Modules found; may exceed max */
+    int max;
+} module_list_t;
+
+static void module_list_add(module_list_t *list, uintptr_t lo, uintptr_t hi) {
+    if (list->count < list->max) {
+        list->ranges[list->count].lo = lo;
+        list->ranges[list->count].hi = hi;
+    }
+    list->count++;
+}
+
+#if defined(__APPLE__)
+
+static void collect_modules(module_list_t *list) {
+    uint32_t images = _dyld_image_count();
+    for (uint32_t i = 0; i < images; i++) {
+        const struct mach_header_64 *header =
+            (const struct mach_header_64 *)_dyld_get_image_header(i);
+        if (!header || header->magic != MH_MAGIC_64) {
+            continue;
+        }
+        intptr_t slide = _dyld_get_image_vmaddr_slide(i);
+        const struct load_command *cmd = (const struct load_command *)(header + 1);
+        for (uint32_t j = 0; j < header->ncmds; j++) {
+            if (cmd->cmd == LC_SEGMENT_64) {
+                const struct segment_command_64 *seg = (const struct segment_command_64 *)cmd;
+                if (strcmp(seg->segname, "__TEXT") == 0) {
+                    uintptr_t lo = (uintptr_t)seg->vmaddr + (uintptr_t)slide;
+                    module_list_add(list, lo, lo + (uintptr_t)seg->vmsize);
+                    break;
+                }
+            }
+            cmd = (const struct load_command *)((const char *)cmd + cmd->cmdsize);
+        }
+    }
+}
+
+#else
+
+static int collect_modules_callback(struct dl_phdr_info *info, size_t size, void *data) {
+    (void)size;
+    module_list_t *list = (module_list_t *)data;
+    
+    for (int i = 0; i < info->dlpi_phnum; i++) {
+        const ElfW(Phdr) *phdr = &info->dlpi_phdr[i];
+        if (phdr->p_type == PT_LOAD && (phdr->p_flags & PF_X) && phdr->p_memsz > 0) {
+            uintptr_t lo = (uintptr_t)info->dlpi_addr + (uintptr_t)phdr->p_vaddr;
+            module_list_add(list, lo, lo + (uintptr_t)phdr->p_memsz);
+        }
+    }
+    return 0;
+}
+
+static void collect_modules(module_list_t *list) {
+    dl_iterate_phdr(collect_modules_callback, list);
+}
+
+static int loader_generation_callback(struct dl_phdr_info *info, size_t size, void *data) {
+    if (size >= offsetof(struct dl_phdr_info, dlpi_subs) + sizeof(info->dlpi_subs)) {
+        *(unsigned long long *)data =
+            (unsigned long long)info->dlpi_adds + (unsigned long long)info->dlpi_subs;
+    }
+    return 1;  /* Every entry carries the same counters */
+}
+
+#endif
+
+#if defined(__APPLE__)
+
+static unsigned long long dyld_changes = 0;
+
+static void dyld_image_changed(const struct mach_header *header, intptr_t slide) {
+    (void)header;
+    (void)slide;
+    __atomic_add_fetch(&dyld_changes, 1, __ATOMIC_RELAXED);
+}
+
+#endif
+
+/*
+ * Count of modules loaded plus modules unloaded so far, or 0 if the
+ * loader does not say. Equal non-zero values mean the module list is
+ * unchanged. Much cheaper than list_modules(): glibc hands out the
+ * counters with the first module, and dyld callbacks keep a running
+ * count.
+ */
+static unsigned long long loader_generation(void) {
+#if defined(__APPLE__)
+    return __atomic_load_n(&dyld_changes, __ATOMIC_RELAXED);
+#else
+    unsigned long long generation = 0;
+    dl_iterate_phdr(loader_generation_callback, &generation);
+    return generation;
+#endif
+}
+
+/*
+ * Fill *list with the executable ranges of all loaded modules, growing
+ * its PyMem-allocated array as needed. Returns -1 with an error set.
+ */
+static int list_modules(module_list_t *list) {
+    list->ranges = NULL;
+    list->max = 0;
+    for (int want = 64; ; want = list->count) {
+        module_range_t *ranges = PyMem_Realloc(list->ranges, (size_t)want * sizeof(module_range_t));
+        if (!ranges) {
+            PyMem_Free(list->ranges);
+            list->ranges = NULL;
+            PyErr_NoMemory();
+            return -1;
+        }
+        list->ranges = ranges;
+        list->max = want;
+        list->count = 0;
+        collect_modules(list);
+        if (list->count <= list->max) {
+            return 0;
+        }
+    }
+}
+
+/*
+ * BacktraceFrame: a single frame in a native stack trace.
+ *
+ * Defined in C so that backtrace_full() can build frames directly,
+ * without an intermediate tuple per frame.
+ *
+ * function and filename are writable and may be set to any object, so
+ * the type supports GC. Like CPython's tuples, a frame holding only str
+ * and None cannot be part of a cycle and stays untracked; it is tracked
+ * once it is given anything else. Frames built by backtrace_full() are
+ * therefore never seen by the collector.
+ */
+typedef struct {
+    PyObject_HEAD
+    unsigned long long pc;
+    PyObject *function;   /* str or None */
+    PyObject *filename;   /* str or None */
+    int lineno;
+} FrameObject;
+
+static PyTypeObject FrameType;
+
+/* Start tracking a frame once a field can hold a reference cycle */
+static void frame_maybe_track(FrameObject *frame) {
+    if (PyObject_GC_IsTracked((PyObject *)frame)) {
+        return;
+    }
+    PyObject *fields[2] = {frame->function, frame->filename};
+    for (int i = 0; i < 2; i++) {
+        if (fields[i] && fields[i] != Py_None && !PyUnicode_CheckExact(fields[i])) {
+            PyObject_GC_Track((PyObject *)frame);
+            return;
+        }
+    }
+}
+
+/*
+ * Freelist of deallocated frames, as in CPython's tupleobject.c.
+ * Profilers capture and drop thousands of traces per second; recycling
+ * frame objects keeps that steady state off the allocator. Frames hold
+ * no references and are untracked once on the list, and the list is only
+ * touched with the GIL held.
+ */
+#define FRAME_FREELIST_SIZE 256
+
+static FrameObject *frame_freelist[FRAME_FREELIST_SIZE];
+static int frame_freelist_count = 0;
+
+/* Create a frame, stealing references to function and filename */
+static PyObject *frame_new_steal(unsigned long long pc, PyObject *function,
+                                 PyObject *filename, int lineno) {
+    FrameObject *frame;
+    if (frame_freelist_count > 0) {
+        frame = frame_freelist[--frame_freelist_count];
+        PyObject_Init((PyObject *)frame, &FrameType);
+    } else {
+        frame = PyObject_GC_New(FrameObject, &FrameType);
+        if (!frame) {
+            Py_DECREF(function);
+            Py_DECREF(filename);
+            return NULL;
+        }
+    }
+    frame->pc = pc;
+    frame->function = function;
+    frame->filename = filename;
+    frame->lineno = lineno;
+    frame_maybe_track(frame);
+    return (PyObject *)frame;
+}
+
+static PyObject *Frame_new(PyTypeObject *type, PyObject *args, PyObject *kwargs) {
+    (void)type;
+    static char *kwlist[] = {"pc", "function", "filename", "lineno", NULL};
+    PyObject *pc_obj;
+    PyObject *function;
+    PyObject *filename;
+    int lineno;
+    
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOi", kwlist,
+                                     &pc_obj, &function, &filename, &lineno)) {
+        return NULL;
+    }
+    
+    /* Checked, unlike "K", which silently wraps negative and huge values */
+    unsigned long long pc = PyLong_AsUnsignedLongLong(pc_obj);
+    if (pc == (unsigned long long)-1 && PyErr_Occurred()) {
+        return NULL;
+    }
+    
+    Py_INCREF(function);
+    Py_INCREF(filename);
+    return frame_new_steal(pc, function, filename, lineno);
+}
+
+static int Frame_traverse(FrameObject *self, visitproc visit, void *arg) {
+    Py_VISIT(self->function);
+    Py_VISIT(self->filename);
+    return 0;
+}
+
+static int Frame_clear(FrameObject *self) {
+    Py_CLEAR(self->function);
+    Py_CLEAR(self->filename);
+    return 0;
+}
+
+static void Frame_dealloc(FrameObject *self) {
+    PyObject_GC_UnTrack(self);
+    Py_CLEAR(self->function);
+    Py_CLEAR(self->filename);
+    if (frame_freelist_count < FRAME_FREELIST_SIZE) {
+        frame_freelist[frame_freelist_count++] = self;
+        return;
+    }
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static PyObject *Frame_repr(FrameObject *self) {
+    return PyUnicode_FromFormat(
+        "BacktraceFrame(pc=%llu, function=%R, filename=%R, lineno=%d)",
+        self->pc,
+        self->function ? self->function : Py_None,
+        self->filename ? self->filename : Py_None,
+        self->lineno
+    );
+}
+
+/* "{function or '??'} at {filename}:{lineno}", or "... at 0x{pc:x}" */
+static PyObject *Frame_str(FrameObject *self) {
+    PyObject *function = self->function ? self->function : Py_None;
+    PyObject *filename = self->filename ? self->filename : Py_None;
+    
+    int has_function = PyObject_IsTrue(function);
+    int has_filename = PyObject_IsTrue(filename);
+    if (has_function < 0 || has_filename < 0) {
+        return NULL;
+    }
+    
+    PyObject *func = has_function ? function : NULL;
+    if (has_filename) {
+        return func
+            ? PyUnicode_FromFormat("%S at %S:%d", func, filename, self->lineno)
+            : PyUnicode_FromFormat("?? at %S:%d", filename, self->lineno);
+    }
+    
+    char addr[32];
+    snprintf(addr, sizeof(addr), "0x%llx", self->pc);
+    return func
+        ? PyUnicode_FromFormat("%S at %s", func, addr)
+        : PyUnicode_FromFormat("?? at %s", addr);
+}
+
+static PyObject *Frame_richcompare(PyObject *a, PyObject *b, int op) {
+    if (!PyObject_TypeCheck(b, &FrameType) || (op != Py_EQ && op != Py_NE)) {
+        Py_RETURN_NOTIMPLEMENTED;
+    }
+    
+    FrameObject *x = (FrameObject *)a;
+    FrameObject *y = (FrameObject *)b;
+    int equal = x->pc == y->pc && x->lineno == y->lineno;
+    if (equal) {
+        equal = PyObject_RichCompareBool(x->function ? x->function : Py_None,
+                                         y->function ? y->function : Py_None, Py_EQ);
+    }
+    if (equal > 0) {
+        equal = PyObject_RichCompareBool(x->filename ? x->filename : Py_None,
+                                         y->filename ? y->filename : Py_None, Py_EQ);
+    }
+    if (equal < 0) {
+        return NULL;
+    }
+    return PyBool_FromLong(op == Py_EQ ? equal : !equal);
+}
+
+/* Get the UTF-8 text of a frame's function or filename (NULL if None) */
+static int frame_field_utf8(PyObject *value, const char **result) {
+    if (!value || value == Py_None) {
+        *result = NULL;
+        return 0;
+    }
+    if (!PyUnicode_Check(value)) {
+        PyErr_Format(PyExc_TypeError, "expected str or None, got %.200s",
+                     Py_TYPE(value)->tp_name);
+        return -1;
+    }
+    *result = PyUnicode_AsUTF8(value);
+    return *result ? 0 : -1;
+}
+
+/*
+ * format_into(buf) -> buf
+ * 
+ * Append str(self), UTF-8 encoded, to a bytearray without creating an
+ * intermediate str.
+ */
+static PyObject *Frame_format_into(FrameObject *self, PyObject *buf) {
+    if (!PyByteArray_Check(buf)) {
+        PyErr_Format(PyExc_TypeError, "format_into() argument must be bytearray, not %.200s",
+                     Py_TYPE(buf)->tp_name);
+        return NULL;
+    }
+    
+    const char *function;
+    const char *filename;
+    if (frame_field_utf8(self->function, &function) < 0 ||
+            frame_field_utf8(self->filename, &filename) < 0) {
+        return NULL;
+    }
+    
+    char data[512];
+    output_buffer_t out;
+    out_init(&out, -1, buf, data, sizeof(data));
+    out_frame(&out, (uintptr_t)self->pc, function, filename, self->lineno);
+    out_flush(&out);
+    if (out.failed) {
+        return NULL;
+    }
+    
+    Py_INCREF(buf);
+    return buf;
+}
+
+/* Pickle and copy by calling the constructor with the four fields */
+static PyObject *Frame_reduce(FrameObject *self, PyObject *Py_UNUSED(ignored)) {
+    return Py_BuildValue("O(KOOi)", Py_TYPE(self), self->pc,
+                         self->function ? self->function : Py_None,
+                         self->filename ? self->filename : Py_None,
+                         self->lineno);
+}
+
+static PyMethodDef Frame_methods[] = {
+    {"format_into", (PyCFunction)Frame_format_into, METH_O,
+     "Append str(frame), UTF-8 encoded, to a bytearray and return it."},
+    {"__reduce__", (PyCFunction)Frame_reduce, METH_NOARGS,
+     "Return state information for pickling."},
+    {NULL, NULL, 0, NULL}
+};
+
+static PyMemberDef Frame_members[] = {
+    {"pc", T_ULONGLONG, offsetof(FrameObject, pc), 0,
+     "Program counter / instruction pointer"},
+    {"lineno", T_INT, offsetof(FrameObject, lineno), 0,
+     "Line number (0 if unknown)"},
+    {NULL, 0, 0, 0, NULL}
+};
+
+/* Getter/setter for function and filename; closure is the field offset */
+static PyObject *Frame_get_field(FrameObject *self, void *closure) {
+    PyObject *value = *(PyObject **)((char *)self + (size_t)closure);
+    if (!value) {
+        value = Py_None;
+    }
+    Py_INCREF(value);
+    return value;
+}
+
+static int Frame_set_field(FrameObject *self, PyObject *value, void *closure) {
+    if (!value) {
+        PyErr_SetString(PyExc_AttributeError, "cannot delete BacktraceFrame fields");
+        return -1;
+    }
+    PyObject **field = (PyObject **)((char *)self + (size_t)closure);
+    PyObject *old = *field;
+    Py_INCREF(value);
+    *field = value;
+    frame_maybe_track(self);
+    Py_XDECREF(old);
+    return 0;
+}
+
+static PyGetSetDef Frame_getset[] = {
+    {"function", (getter)Frame_get_field, (setter)Frame_set_field,
+     "Function name (None if unknown)", (void *)offsetof(FrameObject, function)},
+    {"filename", (getter)Frame_get_field, (setter)Frame_set_field,
+     "Source file path (None if unknown)", (void *)offsetof(FrameObject, filename)},
+    {NULL, NULL, NULL, NULL, NULL}
+};
+
+static PyTypeObject FrameType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "libbacktrace.BacktraceFrame",
+    .tp_doc = "A single frame in a native stack trace.",
+    .tp_basicsize = sizeof(FrameObject),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC,
+    .tp_new = Frame_new,
+    .tp_dealloc = (destructor)Frame_dealloc,
+    .tp_traverse = (traverseproc)Frame_traverse,
+    .tp_clear = (inquiry)Frame_clear,
+    .tp_repr = (reprfunc)Frame_repr,
+    .tp_str = (reprfunc)Frame_str,
+    .tp_hash = PyObject_HashNotImplemented,
+    .tp_richcompare = Frame_richcompare,
+    .tp_methods = Frame_methods,
+    .tp_members = Frame_members,
+    .tp_getset = Frame_getset,
+};
+
+/* Number of slots in the per-state string cache (power of two) */
+#define STRING_CACHE_SIZE 512
+
+/* Cached interned str for a string owned by libbacktrace */
+typedef struct {
+    const char *key;
+    PyObject *value;
+} string_cache_entry_t;
+
+/* Python object wrapping backtrace_state */
+typedef struct {
+    PyObject_HEAD
+    struct backtrace_state *state;
+    char *filename;   /* Owned copy; libbacktrace keeps the pointer */
+    int threaded;
+    PyThread_type_lock lock;  /* Serializes lookups unless threaded */
+    int unwinder;     /* UNWINDER_DWARF or UNWINDER_FP */
+    module_range_t *modules;  /* Sorted code ranges loaded at last (re)load */
+    int nmodules;
+    unsigned long long generation;  /* loader_generation() at last (re)load */
+    string_cache_entry_t strings[STRING_CACHE_SIZE];
+} StateObject;
+
+static void state_clear_strings(StateObject *self) {
+    for (int i = 0; i < STRING_CACHE_SIZE; i++) {
+        self->strings[i].key = NULL;
+        Py_CLEAR(self->strings[i].value);
+    }
+}
+
+/*
+ * libbacktrace cannot free a state, and a warm one holds megabytes of
+ * debug information. Rather than abandon the state of a deallocated State
+ * object, keep it here with its module table and hand it to the next
+ * create_state() for the running program (filename=None) with the same
+ * threaded flag. Memory is then bounded by the peak number of live
+ * states, e.g. by the size of a thread pool whose threads each get a
+ * default state, not by the number of threads ever started. Only
+ * touched with the GIL held.
+ */
+typedef struct {
+    struct backtrace_state *state;
+    int threaded;
+    module_range_t *modules;
+    int nmodules;
+    unsigned long long generation;
+} pooled_state_t;
+
+static pooled_state_t *state_pool = NULL;
+static int state_pool_count = 0;
+static int state_pool_size = 0;
+
+/* Move self's libbacktrace state into the pool; 0 if it must be abandoned */
+static int state_pool_put(StateObject *self) {
+    if (self->filename || !self->state) {
+        return 0;
+    }
+    if (state_pool_count == state_pool_size) {
+        int size = state_pool_size ? 2 * state_pool_size : 8;
+        pooled_state_t *pool = PyMem_Realloc(state_pool, (size_t)size * sizeof(pooled_state_t));
+        if (!pool) {
+            return 0;
+        }
+        state_pool = pool;
+        state_pool_size = size;
+    }
+    
+    pooled_state_t *entry = &state_pool[state_pool_count++];
+    entry->state = self->state;
+    entry->threaded = self->threaded;
+    entry->modules = self->modules;
+    entry->nmodules = self->nmodules;
+    entry->generation = self->generation;
+    self->state = NULL;
+    self->modules = NULL;
+    return 1;
+}
+
+/* Give self a pooled state for the running program, if one matches */
+static int state_pool_take(StateObject *self) {
+    for (int i = state_pool_count - 1; i >= 0; i--) {
+        if (state_pool[i].threaded == self->threaded) {
+            self->state = state_pool[i].state;
+            self->modules = state_pool[i].modules;
+            self->nmodules = state_pool[i].nmodules;
+            self->generation = state_pool[i].generation;
+            state_pool[i] = state_pool[--state_pool_count];
+            return 1;
+        }
+    }
+    return 0;
+}
+
+static void State_dealloc(StateObject *self) {
+    /* libbacktrace can't free a state; keep it for reuse if possible */
+    state_clear_strings(self);
+    state_pool_put(self);
+    if (self->lock) {
+        PyThread_free_lock(self->lock);
+    }
+    PyMem_Free(self->filename);
+    PyMem_Free(self->modules);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+/*
+ * Return an interned str for a function or file name reported by
+ * libbacktrace, or None for NULL.
+ *
+ * libbacktrace hands out pointers into its own symbol and line tables,
+ * which stay put for the lifetime of the state, so the pointer itself is
+ * used as the cache key. The cache is direct-mapped: a colliding name
+ * simply evicts the previous occupant of its slot, which bounds memory
+ * while keeping hot names (recursion, a TU's file name) resident.
+ */
+static PyObject *state_string(StateObject *self, const char *s) {
+    if (!s) {
+        Py_RETURN_NONE;
+    }
+
+    uintptr_t key = (uintptr_t)s;
+    string_cache_entry_t *entry =
+        &self->strings[((key >> 3) ^ (key >> 12)) & (STRING_CACHE_SIZE - 1)];
+
+    /* Compare contents too, in case libbacktrace ever reused the memory */
+    if (entry->key == s) {
+        const char *cached = PyUnicode_AsUTF8(entry->value);
+        if (cached && strcmp(cached, s) == 0) {
+            Py_INCREF(entry->value);
+            return entry->value;
+        }
+        PyErr_Clear();
+    }
+
+    PyObject *value = PyUnicode_FromString(s);
+    if (!value) {
+        return NULL;
+    }
+    PyUnicode_InternInPlace(&value);
+
+    PyObject *evicted = entry->value;
+    Py_INCREF(value);
+    entry->key = s;
+    entry->value = value;
+    Py_XDECREF(evicted);
+    return value;
+}
+
+static PyTypeObject StateType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "libbacktrace.State",
+    .tp_doc = "Backtrace state object",
+    .tp_basicsize = sizeof(StateObject),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_dealloc = (destructor)State_dealloc,
+};
+
+static int compare_module_range(const void *a, const void *b) {
+    const module_range_t *x = (const module_range_t *)a;
+    const module_range_t *y = (const module_range_t *)b;
+    if (x->lo != y->lo) {
+        return x->lo < y->lo ? -1 : 1;
+    }
+    return 0;
+}
+
+/* Number of module tables read from the loader, to observe refreshes */
+static unsigned long module_table_loads = 0;
+
+/* Replace the state's module table with the modules loaded now */
+static int state_load_modules(StateObject *self) {
+    /* Read first, so a module loaded during the walk counts as a change */
+    unsigned long long generation = loader_generation();
+    module_list_t modules;
+    if (list_modules(&modules) < 0) {
+        return -1;
+    }
+    module_table_loads++;
+    qsort(modules.ranges, (size_t)modules.count, sizeof(module_range_t), compare_module_range);
+    
+    PyMem_Free(self->modules);
+    self->modules = modules.ranges;
+    self->nmodules = modules.count;
+    self->generation = generation;
+    return 0;
+}
+
+/* Binary-search the module table for the range containing pc */
+static int state_knows_pc(const StateObject *self, uintptr_t pc) {
+    int lo = 0;
+    int hi = self->nmodules;
+    while (lo < hi) {
+        int mid = lo + (hi - lo) / 2;
+        if (pc < self->modules[mid].lo) {
+            hi = mid;
+        } else if (pc >= self->modules[mid].hi) {
+            lo = mid + 1;
+        } else {
+            return 1;
+        }
+    }
+    return 0;
+}
+
+/*
+ * Swap in a fresh libbacktrace state and drop names from the old one.
+ * libbacktrace cannot free a state, so the old one, with any debug
+ * information it read, is abandoned.
+ */
+static int state_reset(StateObject *self) {
+    struct backtrace_state *fresh = backtrace_create_state(
+        self->filename, self->threaded, error_callback, NULL);
+    if (!fresh) {
+        PyErr_SetString(PyExc_RuntimeError, "Failed to create backtrace state");
+        return -1;
+    }
+    
+    self->state = fresh;
+    state_clear_strings(self);
+    return 0;
+}
+
+/*
+ * Called after resolving frames. libbacktrace reads the list of loaded
+ * modules once, so a library dlopen'd later resolves to unknown frames.
+ * If a frame has no function and its PC lies outside every known module,
+ * reload the module table from the loader; if that PC is now covered,
+ * swap in a fresh state so the next lookup reads the new library.
+ * 
+ * PCs that belong to no module at all (JIT code, trampolines) miss on
+ * every call, so the table is only reloaded when loader_generation() says
+ * modules were loaded or unloaded since it was built, and *reloaded
+ * limits that to once per call. Returns 1 if the state was replaced and frames should be
+ * resolved again. Failures are ignored: the frames just stay unknown.
+ * 
+ * Every replacement abandons the old state (see state_reset()), so each
+ * newly seen library costs the memory of one state's debug information.
+ */
+static int state_refresh_for(StateObject *self, const backtrace_context_t *ctx,
+                             int *reloaded) {
+    if (*reloaded) {
+        return 0;
+    }
+    
+    uintptr_t missed[MAX_FRAMES];
+    int nmissed = 0;
+    for (int i = 0; i < ctx->count; i++) {
+        uintptr_t pc = ctx->frames[i].pc;
+        /* The outermost frame's null return address shows up as PC -1 */
+        if (!ctx->frames[i].function && pc != UINTPTR_MAX && !state_knows_pc(self, pc)) {
+            missed[nmissed++] = pc;
+        }
+    }
+    if (nmissed == 0) {
+        return 0;
+    }
+    
+    unsigned long long generation = loader_generation();
+    if (generation != 0 && generation == self->generation) {
+        return 0;
+    }
+    
+    *reloaded = 1;
+    if (state_load_modules(self) < 0) {
+        PyErr_Clear();
+        return 0;
+    }
+    
+    for (int i = 0; i < nmissed; i++) {
+        if (state_knows_pc(self, missed[i])) {
+            if (state_reset(self) < 0) {
+                PyErr_Clear();
+                return 0;
+            }
+            return 1;
+        }
+    }
+    return 0;
+}
+
+/*
+ * Call backtrace_pcinfo() for count native-endian uint64 PCs at raw (which
+ * need not be aligned), until the callback returns non-zero.
+ *
+ * Lookups touch no Python objects, so they run with the GIL released and
+ * threads with their own states symbolize in parallel. libbacktrace only
+ * allows concurrent use of a threaded state; any other is serialized by
+ * its lock, which a per-thread default state never finds taken. A state
+ * replaced meanwhile by state_reset() stays valid, as states are never
+ * freed.
+ */
+static void state_pcinfo(StateObject *self, const char *raw, Py_ssize_t count,
+                         backtrace_full_callback callback, void *data) {
+    struct backtrace_state *state = self->state;
+    PyThread_type_lock lock = self->lock;
+    
+    Py_BEGIN_ALLOW_THREADS
+    if (lock) {
+        PyThread_acquire_lock(lock, WAIT_LOCK);
+    }
+    for (Py_ssize_t i = 0; i < count; i++) {
+        uint64_t pc;
+        memcpy(&pc, raw + i * (Py_ssize_t)sizeof(uint64_t), sizeof(pc));
+        if (backtrace_pcinfo(state, (uintptr_t)pc, callback, error_callback, data) != 0) {
+            break;
+        }
+    }
+    if (lock) {
+        PyThread_release_lock(lock);
+    }
+    Py_END_ALLOW_THREADS
+}
+
+/* Symbolize pcs into ctx, replacing the state first if it predates a module */
+static void resolve_pcs(StateObject *self, const uint64_t *pcs, int count,
+                        backtrace_context_t *ctx) {
+    int reloaded = 0;
+    do {
+        ctx->count = 0;
+        state_pcinfo(self, (const char *)pcs, count, full_callback, ctx);
+    } while (state_refresh_for(self, ctx, &reloaded));
+}
+
+/*
+ * create_state(filename=None, threaded=True, unwinder="dwarf") -> State
+ * 
+ * Create a new backtrace state for the given executable. For the running
+ * program, a state left behind by a deallocated State object is reused.
+ */
+static PyObject *create_state(PyObject *self, PyObject *args) {
+    (void)self;
+    const char *filename = NULL;
+    int threaded = 1;
+    const char *unwinder_name = "dwarf";
+    int unwinder;
+    
+    if (!PyArg_ParseTuple(args, "|zps", &filename, &threaded, &unwinder_name)) {
+        return NULL;
+    }
+    
+    if (strcmp(unwinder_name, "dwarf") == 0) {
+        unwinder = UNWINDER_DWARF;
+    } else if (strcmp(unwinder_name, "fp") == 0) {
+        if (!HAVE_FP_UNWINDER) {
+            PyErr_SetString(PyExc_ValueError,
+                            "frame-pointer unwinder not supported on this architecture");
+            return NULL;
+        }
+        unwinder = UNWINDER_FP;
+    } else {
+        PyErr_Format(PyExc_ValueError, "unknown unwinder: %s", unwinder_name);
+        return NULL;
+    }
+    
+    StateObject *state_obj = PyObject_New(StateObject, &StateType);
+    if (!state_obj) {
+        return NULL;
+    }
+    memset(state_obj->strings, 0, sizeof(state_obj->strings));
+    state_obj->state = NULL;
+    state_obj->filename = NULL;
+    state_obj->modules = NULL;
+    state_obj->nmodules = 0;
+    state_obj->generation = 0;
+    state_obj->threaded = threaded;
+    state_obj->lock = NULL;
+    state_obj->unwinder = unwinder;
+    
+    if (!threaded) {
+        state_obj->lock = PyThread_allocate_lock();
+        if (!state_obj->lock) {
+            Py_DECREF(state_obj);
+            return PyErr_NoMemory();
+        }
+    }
+    
+    /* libbacktrace reads the file lazily, so it needs a stable copy */
+    if (filename) {
+        size_t size = strlen(filename) + 1;
+        state_obj->filename = PyMem_Malloc(size);
+        if (!state_obj->filename) {
+            Py_DECREF(state_obj);
+            return PyErr_NoMemory();
+        }
+        memcpy(state_obj->filename, filename, size);
+    } else if (state_pool_take(state_obj)) {
+        return (PyObject *)state_obj;
+    }
+    
+    state_obj->state = backtrace_create_state(state_obj->filename, threaded,
+                                              error_callback, NULL);
+    if (!state_obj->state) {
+        Py_DECREF(state_obj);
+        PyErr_SetString(PyExc_RuntimeError, "Failed to create backtrace state");
+        return NULL;
+    }
+    
+    if (state_load_modules(state_obj) < 0) {
+        Py_DECREF(state_obj);
+        return NULL;
+    }
+    
+    return (PyObject *)state_obj;
+}
+
+/*
+ * _state_id(state) -> int
+ * 
+ * Identify the underlying libbacktrace state, to observe pooling.
+ */
+static PyObject *py_state_id(PyObject *self, PyObject *args) {
+    (void)self;
+    StateObject *state_obj;
+    
+    if (!PyArg_ParseTuple(args, "O!", &StateType, &state_obj)) {
+        return NULL;
+    }
+    return PyLong_FromVoidPtr(state_obj->state);
+}
+
+/*
+ * _module_table_loads() -> int
+ * 
+ * Count the module tables read from the loader so far, to observe when
+ * lookups trigger a refresh.
+ */
+static PyObject *py_module_table_loads(PyObject *self, PyObject *args) {
+    (void)self;
+    (void)args;
+    return PyLong_FromUnsignedLong(module_table_loads);
+}
+
+/*
+ * refresh_modules(state) -> bool
+ * 
+ * Re-read the list of loaded modules and, if it changed since the state
+ * last read it, replace the libbacktrace state so newly dlopen'd
+ * libraries resolve. Returns True if the state was replaced. The old
+ * state is abandoned (see state_reset()) and its memory not returned.
+ */
+static PyObject *py_refresh_modules(PyObject *self, PyObject *args) {
+    (void)self;
+    StateObject *state_obj;
+    
+    if (!PyArg_ParseTuple(args, "O!", &StateType, &state_obj)) {
+        return NULL;
+    }
+    
+    unsigned long long generation = loader_generation();
+    if (generation != 0 && generation == state_obj->generation) {
+        Py_RETURN_FALSE;
+    }
+    
+    module_range_t *old = state_obj->modules;
+    int nold = state_obj->nmodules;
+    state_obj->modules = NULL;
+    if (state_load_modules(state_obj) < 0) {
+        state_obj->modules = old;
+        return NULL;
+    }
+    
+    int changed = state_obj->nmodules != nold ||
+        memcmp(state_obj->modules, old, (size_t)nold * sizeof(module_range_t)) != 0;
+    PyMem_Free(old);
+    if (changed && state_reset(state_obj) < 0) {
+        return NULL;
+    }
+    
+    return PyBool_FromLong(changed);
+}
+
+static int prewarm_callback(void *data, uintptr_t pc,
+                            const char *filename, int lineno,
+                            const char *function) {
+    (void)data;
+    (void)pc;
+    (void)filename;
+    (void)lineno;
+    (void)function;
+    return 0;
+}
+
+/* Distance between the addresses prewarm() looks up in a module's code */
+#define PREWARM_STRIDE 256
+
+/*
+ * prewarm(state) -> int
+ * 
+ * Look up an address every PREWARM_STRIDE bytes of every loaded module's
+ * code. The first lookup in a module makes libbacktrace read its debug
+ * sections; libbacktrace then reads each compilation unit's line table
+ * and function information only when a PC first lands in that unit, so
+ * the probes walk through the units one by one. Only a unit smaller than
+ * the stride that falls between two probes is left to load lazily.
+ * Doing this before fork() lets worker processes share the populated
+ * state copy-on-write instead of each building its own. Returns the
+ * number of module code ranges visited.
+ */
+static PyObject *py_prewarm(PyObject *self, PyObject *args) {
+    (void)self;
+    StateObject *state_obj;
+    
+    if (!PyArg_ParseTuple(args, "O!", &StateType, &state_obj)) {
+        return NULL;
+    }
+    
+    module_list_t modules;
+    if (list_modules(&modules) < 0) {
+        return NULL;
+    }
+    
+    int count = modules.count;
+    size_t npcs = 0;
+    for (int i = 0; i < count; i++) {
+        npcs += (modules.ranges[i].hi - modules.ranges[i].lo + PREWARM_STRIDE - 1) / PREWARM_STRIDE;
+    }
+    uint64_t *pcs = PyMem_Malloc((npcs ? npcs : 1) * sizeof(uint64_t));
+    if (!pcs) {
+        PyMem_Free(modules.ranges);
+        return PyErr_NoMemory();
+    }
+    size_t n = 0;
+    for (int i = 0; i < count; i++) {
+        for (uintptr_t pc = modules.ranges[i].lo; pc < modules.ranges[i].hi; pc += PREWARM_STRIDE) {
+            pcs[n++] = (uint64_t)pc;
+        }
+    }
+    PyMem_Free(modules.ranges);
+    
+    state_pcinfo(state_obj, (const char *)pcs, (Py_ssize_t)n, prewarm_callback, NULL);
+    PyMem_Free(pcs);
+    return PyLong_FromLong(count);
+}
+
+/* Create a BacktraceFrame from collected frame data */
+static PyObject *frame_from_data(StateObject *state_obj, const frame_data_t *f) {
+    PyObject *function = state_string(state_obj, f->function);
+    if (!function) {
+        return NULL;
+    }
+    PyObject *filename = state_string(state_obj, f->filename);
+    if (!filename) {
+        Py_DECREF(function);
+        return NULL;
+    }
+    return frame_new_steal((unsigned long long)f->pc, function, filename, f->lineno);
+}
+
+/* Build Python list of BacktraceFrame objects */
+static PyObject *frames_to_list(StateObject *state_obj, const backtrace_context_t *ctx) {
+    PyObject *result = PyList_New(ctx->count);
+    if (!result) {
+        return NULL;
+    }
+    
+    for (int i = 0; i < ctx->count; i++) {
+        PyObject *frame = frame_from_data(state_obj, &ctx->frames[i]);
+        if (!frame) {
+            Py_DECREF(result);
+            return NULL;
+        }
+        PyList_SET_ITEM(result, i, frame);
+    }
+    
+    return result;
+}
+
+/* Context for backtrace_simple callback (program counters only) */
+typedef struct {
+    uint64_t pcs[MAX_FRAMES];
+    int count;
+} simple_context_t;
+
+/* Callback for each frame without symbol lookup */
+static int simple_callback(void *data, uintptr_t pc) {
+    simple_context_t *ctx = (simple_context_t *)data;
+
+    if (ctx->count >= MAX_FRAMES) {
+        return 1;  /* Stop iteration */
+    }
+
+    ctx->pcs[ctx->count++] = (uint64_t)pc;
+    return 0;
+}
+
+/* Context for into_callback (PCs into a caller-provided array) */
+typedef struct {
+    uint64_t *pcs;
+    int count;
+    int max;
+} into_context_t;
+
+static int into_callback(void *data, uintptr_t pc) {
+    into_context_t *ctx = (into_context_t *)data;
+
+    if (ctx->count >= ctx->max) {
+        return 1;  /* Stop iteration */
+    }
+
+    ctx->pcs[ctx->count++] = (uint64_t)pc;
+    return 0;
+}
+
+/*
+ * Unwind the calling thread's stack into pcs with the state's unwinder,
+ * skipping `skip` frames above the caller (0 starts inside the caller).
+ * No symbols are looked up. Returns the number of PCs stored.
+ *
+ * The frame-pointer walk ends at the first frame built without a frame
+ * pointer. On an interpreter compiled without them that is just above
+ * this extension, so once the binding's own frames are skipped nothing
+ * is left; fall back to DWARF unwinding rather than return an empty trace.
+ */
+__attribute__((noinline))
+static int capture_pcs(StateObject *state_obj, int skip, uint64_t *pcs, int max) {
+    /* +1 skips this function */
+    if (state_obj->unwinder == UNWINDER_FP) {
+        int count = unwind_fp(skip + 1, pcs, max);
+        if (count > 0) {
+            return count;
+        }
+    }
+    
+    into_context_t ctx;
+    ctx.pcs = pcs;
+    ctx.count = 0;
+    ctx.max = max;
+    backtrace_simple(state_obj->state, skip + 1, into_callback, error_callback, &ctx);
+    return ctx.count;
+}
+
+/*
+ * backtrace_full(state, skip=0) -> list of BacktraceFrame
+ * 
+ * Get a full backtrace with symbol information.
+ */
+static PyObject *py_backtrace_full(PyObject *self, PyObject *args) {
+    (void)self;
+    StateObject *state_obj;
+    int skip = 0;
+    
+    if (!PyArg_ParseTuple(args, "O!|i", &StateType, &state_obj, &skip)) {
+        return NULL;
+    }
+    
+    /* Skip this function; skipped frames are never symbolized */
+    uint64_t pcs[MAX_FRAMES];
+    int count = capture_pcs(state_obj, skip + 1, pcs, MAX_FRAMES);
+    
+    backtrace_context_t ctx;
+    resolve_pcs(state_obj, pcs, count, &ctx);
+    
+    return frames_to_list(state_obj, &ctx);
+}
+
+/*
+ * backtrace_simple(state, skip=0) -> bytes
+ *
+ * Unwind the stack without resolving symbols. The result holds one
+ * native-endian uint64 per frame, suitable for array('Q').frombytes().
+ */
+static PyObject *py_backtrace_simple(PyObject *self, PyObject *args) {
+    (void)self;
+    StateObject *state_obj;
+    int skip = 0;
+
+    if (!PyArg_ParseTuple(args, "O!|i", &StateType, &state_obj, &skip)) {
+        return NULL;
+    }
+
+    /* Skip this function; no symbols are looked up for skipped frames */
+    uint64_t pcs[MAX_FRAMES];
+    int count = capture_pcs(state_obj, skip + 1, pcs, MAX_FRAMES);
+
+    return PyBytes_FromStringAndSize((const char *)pcs,
+                                     (Py_ssize_t)count * (Py_ssize_t)sizeof(uint64_t));
+}
+
+/*
+ * backtrace_simple_into(state, skip, buf) -> int
+ * 
+ * Like backtrace_simple(), but writes the PCs into a writable buffer of
+ * native-endian uint64 values (e.g. array('Q')) instead of allocating.
+ * Slots past the last frame are zeroed. Returns the number of frames.
+ */
+static PyObject *py_backtrace_simple_into(PyObject *self, PyObject *args) {
+    (void)self;
+    StateObject *state_obj;
+    int skip;
+    PyObject *buf;
+
+    if (!PyArg_ParseTuple(args, "O!iO", &StateType, &state_obj, &skip, &buf)) {
+        return NULL;
+    }
+
+    Py_buffer view;
+    if (PyObject_GetBuffer(buf, &view, PyBUF_WRITABLE | PyBUF_C_CONTIGUOUS) < 0) {
+        return NULL;
+    }
+    if (view.len % (Py_ssize_t)sizeof(uint64_t) != 0 ||
+            (uintptr_t)view.buf % _Alignof(uint64_t) != 0) {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError,
+                        "buffer must hold aligned 8-byte program counters");
+        return NULL;
+    }
+
+    Py_ssize_t slots = view.len / (Py_ssize_t)sizeof(uint64_t);
+    uint64_t *pcs = (uint64_t *)view.buf;
+
+    /* Skip this function; no symbols are looked up for skipped frames */
+    int count = capture_pcs(state_obj, skip + 1, pcs, slots < INT_MAX ? (int)slots : INT_MAX);
+    memset(pcs + count, 0, (size_t)(slots - count) * sizeof(uint64_t));
+
+    PyBuffer_Release(&view);
+    return PyLong_FromLong(count);
+}
+
+/* array('Q') and array('i') holding a single 0, set up at import */
+static PyObject *pc_column_unit = NULL;
+static PyObject *lineno_column_unit = NULL;
+
+/* Return unit repeated n times, with *view exporting its writable buffer */
+static PyObject *new_column(PyObject *unit, Py_ssize_t n, Py_buffer *view) {
+    PyObject *column = PySequence_Repeat(unit, n);
+    if (!column) {
+        return NULL;
+    }
+    if (PyObject_GetBuffer(column, view, PyBUF_WRITABLE) < 0) {
+        Py_DECREF(column);
+        return NULL;
+    }
+    return column;
+}
+
+/*
+ * Build (pcs, functions, filenames, linenos) columns from collected frames.
+ * pcs is an array('Q') and linenos an array('i'), written in place through
+ * the buffer protocol.
+ */
+static PyObject *frames_to_columns(StateObject *state_obj, const backtrace_context_t *ctx) {
+    Py_buffer pcs_view, linenos_view;
+    PyObject *linenos_array = NULL;
+    PyObject *functions = NULL;
+    PyObject *filenames = NULL;
+    PyObject *pcs_array = new_column(pc_column_unit, ctx->count, &pcs_view);
+    if (!pcs_array) {
+        return NULL;
+    }
+    linenos_array = new_column(lineno_column_unit, ctx->count, &linenos_view);
+    if (!linenos_array) {
+        PyBuffer_Release(&pcs_view);
+        Py_DECREF(pcs_array);
+        return NULL;
+    }
+    
+    uint64_t *pcs = (uint64_t *)pcs_view.buf;
+    int *linenos = (int *)linenos_view.buf;
+    for (int i = 0; i < ctx->count; i++) {
+        pcs[i] = (uint64_t)ctx->frames[i].pc;
+        linenos[i] = ctx->frames[i].lineno;
+    }
+    PyBuffer_Release(&pcs_view);
+    PyBuffer_Release(&linenos_view);
+
+    functions = PyList_New(ctx->count);
+    filenames = PyList_New(ctx->count);
+    if (!functions || !filenames) {
+        goto error;
+    }
+
+    for (int i = 0; i < ctx->count; i++) {
+        const frame_data_t *f = &ctx->frames[i];
+
+        PyObject *function = state_string(state_obj, f->function);
+        if (!function) {
+            goto error;
+        }
+        PyList_SET_ITEM(functions, i, function);
+
+        PyObject *filename = state_string(state_obj, f->filename);
+        if (!filename) {
+            goto error;
+        }
+        PyList_SET_ITEM(filenames, i, filename);
+    }
+
+    return Py_BuildValue("(NNNN)", pcs_array, functions, filenames, linenos_array);
+
+error:
+    Py_DECREF(pcs_array);
+    Py_DECREF(linenos_array);
+    Py_XDECREF(functions);
+    Py_XDECREF(filenames);
+    return NULL;
+}
+
+/*
+ * resolve(state, pcs) -> (pcs, functions, filenames, linenos)
+ *
+ * Resolve program counters captured by backtrace_simple(). pcs must be a
+ * buffer of native-endian uint64 values (e.g. array('Q')). A single PC may
+ * produce several frames when it falls inside inlined code, so the
+ * returned columns can be longer than the input.
+ */
+static PyObject *py_resolve(PyObject *self, PyObject *args) {
+    (void)self;
+    StateObject *state_obj;
+    Py_buffer view;
+
+    if (!PyArg_ParseTuple(args, "O!y*", &StateType, &state_obj, &view)) {
+        return NULL;
+    }
+
+    if (view.len % (Py_ssize_t)sizeof(uint64_t) != 0) {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError, "pcs buffer must contain uint64 values");
+        return NULL;
+    }
 
-/* Maximum frames to capture */
-#define MAX_FRAMES 128
+    backtrace_context_t ctx;
+    Py_ssize_t npcs = view.len / (Py_ssize_t)sizeof(uint64_t);
+    const char *raw = (const char *)view.buf;
+    int reloaded = 0;
 
-/* Frame data collected during backtrace */
-typedef struct {
-    uintptr_t pc;
-    const char *function;
-    const char *filename;
-    int lineno;
-} frame_data_t;
+    do {
+        ctx.count = 0;
+        state_pcinfo(state_obj, raw, npcs, full_callback, &ctx);
+    } while (state_refresh_for(state_obj, &ctx, &reloaded));
+    PyBuffer_Release(&view);
 
-/* Context for backtrace callback */
+    return frames_to_columns(state_obj, &ctx);
+}
+
+/* Program counter tagged with its position in the caller's buffer */
 typedef struct {
-    frame_data_t frames[MAX_FRAMES];
-    int count;
-    int skip;
-} backtrace_context_t;
+    uint64_t pc;
+    Py_ssize_t index;
+} pc_index_t;
 
-/* Callback for each frame with full symbol info */
-static int full_callback(void *data, uintptr_t pc,
-                         const char *filename, int lineno,
-                         const char *function) {
-    backtrace_context_t *ctx = (backtrace_context_t *)data;
-    
-    /* Skip requested frames */
-    if (ctx->skip > 0) {
-        ctx->skip--;
-        return 0;
-    }
-    
-    if (ctx->count >= MAX_FRAMES) {
-        return 1;  /* Stop iteration */
+static int compare_pc_index(const void *a, const void *b) {
+    const pc_index_t *x = (const pc_index_t *)a;
+    const pc_index_t *y = (const pc_index_t *)b;
+    if (x->pc != y->pc) {
+        return x->pc < y->pc ? -1 : 1;
     }
-    
-    frame_data_t *frame = &ctx->frames[ctx->count++];
-    frame->pc = pc;
-    frame->function = function;
-    frame->filename = filename;
-    frame->lineno = lineno;
-    
-    return 0;
+    return x->index < y->index ? -1 : (x->index > y->index);
 }
 
-/* Error callback */
-static void error_callback(void *data, const char *msg, int errnum) {
-    (void)data;
-    (void)msg;
-    (void)errnum;
-    /* Silently ignore errors - we just won't have symbols */
+/* Build a tuple of BacktraceFrame objects from collected frames */
+static PyObject *frames_to_tuple(StateObject *state_obj, const backtrace_context_t *ctx) {
+    PyObject *result = PyTuple_New(ctx->count);
+    if (!result) {
+        return NULL;
+    }
+
+    for (int i = 0; i < ctx->count; i++) {
+        PyObject *frame = frame_from_data(state_obj, &ctx->frames[i]);
+        if (!frame) {
+            Py_DECREF(result);
+            return NULL;
+        }
+        PyTuple_SET_ITEM(result, i, frame);
+    }
+
+    return result;
 }
 
-/* Python object wrapping backtrace_state */
-typedef struct {
-    PyObject_HEAD
-    struct backtrace_state *state;
-} StateObject;
+/*
+ * resolve_batch(state, pcs) -> list of tuple of BacktraceFrame
+ *
+ * Resolve a large buffer of program counters, e.g. every PC from many
+ * deferred traces. PCs are sorted so each distinct PC is looked up once
+ * and neighbouring lookups hit the same compilation unit and line table
+ * while they are still cache-hot. The result is in input order: one tuple
+ * per PC holding its frames (several when the PC is in inlined code);
+ * repeated PCs share the same tuple.
+ */
+static PyObject *py_resolve_batch(PyObject *self, PyObject *args) {
+    (void)self;
+    StateObject *state_obj;
+    Py_buffer view;
 
-static void State_dealloc(StateObject *self) {
-    /* Note: libbacktrace doesn't provide a way to free state */
-    Py_TYPE(self)->tp_free((PyObject *)self);
+    if (!PyArg_ParseTuple(args, "O!y*", &StateType, &state_obj, &view)) {
+        return NULL;
+    }
+
+    if (view.len % (Py_ssize_t)sizeof(uint64_t) != 0) {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError, "pcs buffer must contain uint64 values");
+        return NULL;
+    }
+
+    Py_ssize_t npcs = view.len / (Py_ssize_t)sizeof(uint64_t);
+    PyObject *result = PyList_New(npcs);
+    pc_index_t *order = PyMem_Malloc((size_t)(npcs ? npcs : 1) * sizeof(pc_index_t));
+    backtrace_context_t *ctx = PyMem_Malloc(sizeof(backtrace_context_t));
+    if (!result || !order || !ctx) {
+        if (result) {
+            Py_CLEAR(result);
+            PyErr_NoMemory();
+        }
+        goto done;
+    }
+
+    const char *raw = (const char *)view.buf;
+    for (Py_ssize_t i = 0; i < npcs; i++) {
+        memcpy(&order[i].pc, raw + i * (Py_ssize_t)sizeof(uint64_t), sizeof(uint64_t));
+        order[i].index = i;
+    }
+    qsort(order, (size_t)npcs, sizeof(pc_index_t), compare_pc_index);
+
+    int reloaded = 0;
+    for (Py_ssize_t i = 0; i < npcs; ) {
+        do {
+            ctx->count = 0;
+            state_pcinfo(state_obj, (const char *)&order[i].pc, 1, full_callback, ctx);
+        } while (state_refresh_for(state_obj, ctx, &reloaded));
+
+        PyObject *frames = frames_to_tuple(state_obj, ctx);
+        if (!frames) {
+            Py_CLEAR(result);
+            goto done;
+        }
+
+        /* Every occurrence of this PC shares the same tuple */
+        Py_ssize_t j = i;
+        do {
+            Py_INCREF(frames);
+            PyList_SET_ITEM(result, order[j].index, frames);
+            j++;
+        } while (j < npcs && order[j].pc == order[i].pc);
+        Py_DECREF(frames);
+        i = j;
+    }
+
+done:
+    PyBuffer_Release(&view);
+    PyMem_Free(order);
+    PyMem_Free(ctx);
+    return result;
 }
 
-static PyTypeObject StateType = {
-    PyVarObject_HEAD_INIT(NULL, 0)
-    .tp_name = "libbacktrace.State",
-    .tp_doc = "Backtrace state object",
-    .tp_basicsize = sizeof(StateObject),
-    .tp_itemsize = 0,
-    .tp_flags = Py_TPFLAGS_DEFAULT,
-    .tp_dealloc = (destructor)State_dealloc,
-};
+/* Staging buffer for format_backtrace(); guarded by the GIL */
+static char format_output_data[OUTPUT_BUFFER_SIZE];
+
+/* Write "  #N function at file:line" lines (as print_backtrace does) */
+static void format_frames(output_buffer_t *out, const backtrace_context_t *ctx) {
+    for (int i = 0; i < ctx->count; i++) {
+        const frame_data_t *frame = &ctx->frames[i];
+        out_str(out, "  #");
+        out_dec(out, i);
+        out_str(out, " ");
+        out_frame(out, frame->pc, frame->function, frame->filename, frame->lineno);
+        out_str(out, "\n");
+    }
+}
 
 /*
- * create_state(filename=None, threaded=True) -> State
+ * format_backtrace(state, skip, fd) -> int
  * 
- * Create a new backtrace state for the given executable.
+ * Get a full backtrace formatted as print_backtrace() does and write it
+ * to a file descriptor (an int or object with fileno()), with one
+ * write(2) per 16 KiB of output. Returns the number of frames written.
  */
-static PyObject *create_state(PyObject *self, PyObject *args) {
+static PyObject *py_format_backtrace(PyObject *self, PyObject *args) {
     (void)self;
-    const char *filename = NULL;
-    int threaded = 1;
+    StateObject *state_obj;
+    int skip;
+    PyObject *target;
     
-    if (!PyArg_ParseTuple(args, "|zp", &filename, &threaded)) {
+    if (!PyArg_ParseTuple(args, "O!iO", &StateType, &state_obj, &skip, &target)) {
         return NULL;
     }
     
-    StateObject *state_obj = PyObject_New(StateObject, &StateType);
-    if (!state_obj) {
+    int fd = PyObject_AsFileDescriptor(target);
+    if (fd < 0) {
         return NULL;
     }
     
-    state_obj->state = backtrace_create_state(filename, threaded, error_callback, NULL);
-    if (!state_obj->state) {
-        Py_DECREF(state_obj);
-        PyErr_SetString(PyExc_RuntimeError, "Failed to create backtrace state");
-        return NULL;
-    }
+    /* Skip this function; skipped frames are never symbolized */
+    uint64_t pcs[MAX_FRAMES];
+    int count = capture_pcs(state_obj, skip + 1, pcs, MAX_FRAMES);
     
-    return (PyObject *)state_obj;
+    backtrace_context_t ctx;
+    resolve_pcs(state_obj, pcs, count, &ctx);
+    
+    output_buffer_t out;
+    out_init(&out, fd, NULL, format_output_data, sizeof(format_output_data));
+    format_frames(&out, &ctx);
+    out_flush(&out);
+    
+    return PyLong_FromLong(ctx.count);
 }
 
 /*
- * backtrace_full(state, skip=0) -> list of (pc, function, filename, lineno)
+ * format_backtrace_into(state, skip, buf) -> int
  * 
- * Get a full backtrace with symbol information.
+ * Like format_backtrace(), but writes the text into a bytearray starting
+ * at offset 0, growing it only if it is too small and never shrinking it,
+ * so a buffer reused across calls stops hitting the allocator. Returns
+ * the number of bytes written (0 if no frames were found).
  */
-static PyObject *py_backtrace_full(PyObject *self, PyObject *args) {
+static PyObject *py_format_backtrace_into(PyObject *self, PyObject *args) {
     (void)self;
     StateObject *state_obj;
-    int skip = 0;
+    int skip;
+    PyObject *buf;
     
-    if (!PyArg_ParseTuple(args, "O!|i", &StateType, &state_obj, &skip)) {
+    if (!PyArg_ParseTuple(args, "O!iO!", &StateType, &state_obj, &skip,
+                          &PyByteArray_Type, &buf)) {
         return NULL;
     }
     
-    backtrace_context_t ctx = {0};
-    ctx.skip = skip + 1;  /* Skip this function */
+    /* Skip this function; skipped frames are never symbolized */
+    uint64_t pcs[MAX_FRAMES];
+    int count = capture_pcs(state_obj, skip + 1, pcs, MAX_FRAMES);
     
-    backtrace_full(state_obj->state, 0, full_callback, error_callback, &ctx);
+    backtrace_context_t ctx;
+    resolve_pcs(state_obj, pcs, count, &ctx);
     
-    /* Build Python list of tuples */
-    PyObject *result = PyList_New(ctx.count);
-    if (!result) {
-        return NULL;
-    }
+    output_buffer_t out;
+    out_init(&out, -1, buf, NULL, 0);  /* Unstaged: straight into buf */
+    out.sink_pos = 0;
+    format_frames(&out, &ctx);
     
-    for (int i = 0; i < ctx.count; i++) {
-        frame_data_t *f = &ctx.frames[i];
-        PyObject *tuple = Py_BuildValue(
-            "(kzzl)",
-            (unsigned long)f->pc,
-            f->function,
-            f->filename,
-            (long)f->lineno
-        );
-        if (!tuple) {
-            Py_DECREF(result);
-            return NULL;
-        }
-        PyList_SET_ITEM(result, i, tuple);
+    if (out.failed) {
+        return NULL;
     }
-    
-    return result;
+    return PyLong_FromSsize_t(out.sink_pos);
 }
 
 /*
@@ -184,39 +1813,49 @@ static struct backtrace_state *signal_handler_state = NULL;
 static int signal_handler_enabled = 0;
 static char crash_report_path[512] = {0};
 
+/*
+ * Everything the signal handler touches is allocated up front, in
+ * enable_faulthandler() or statically: the PC array, the output buffer
+ * and the alternate signal stack. Only one thread may use them at a time.
+ */
+static char crash_output_data[OUTPUT_BUFFER_SIZE];
+static output_buffer_t crash_output;
+static simple_context_t crash_trace;
+static int crash_in_progress = 0;
+static pthread_t crash_owner;
+
+/* Alternate signal stack, so stack overflows can still be reported */
+#define CRASH_ALTSTACK_EXTRA (64 * 1024)
+static void *crash_altstack = NULL;
+static stack_t crash_prev_altstack;  /* What crash_altstack replaced */
+
 /* Callback for printing frames in signal handler (async-signal-safe) */
 static int signal_print_callback(void *data, uintptr_t pc,
                                   const char *filename, int lineno,
                                   const char *function) {
-    int fd = *(int *)data;
-    char buf[512];
-    int len;
-    
-    if (function && filename) {
-        len = snprintf(buf, sizeof(buf), "  #%p %s at %s:%d\n", 
-                       (void *)pc, function, filename, lineno);
-    } else if (function) {
-        len = snprintf(buf, sizeof(buf), "  #%p %s\n", (void *)pc, function);
-    } else if (filename) {
-        len = snprintf(buf, sizeof(buf), "  #%p ??? at %s:%d\n", 
-                       (void *)pc, filename, lineno);
-    } else {
-        len = snprintf(buf, sizeof(buf), "  #%p ???\n", (void *)pc);
-    }
+    output_buffer_t *out = (output_buffer_t *)data;
     
-    if (len > 0) {
-        (void)write(fd, buf, (size_t)len);
+    out_str(out, "  #");
+    out_hex(out, pc);
+    out_str(out, " ");
+    out_str(out, function ? function : "???");
+    if (filename) {
+        out_str(out, " at ");
+        out_str(out, filename);
+        out_str(out, ":");
+        out_dec(out, lineno);
     }
+    out_str(out, "\n");
     return 0;
 }
 
 static void signal_error_callback(void *data, const char *msg, int errnum) {
-    (void)data;
+    output_buffer_t *out = (output_buffer_t *)data;
     (void)errnum;
     if (msg) {
-        (void)write(STDERR_FILENO, "  [backtrace error: ", 20);
-        (void)write(STDERR_FILENO, msg, strlen(msg));
-        (void)write(STDERR_FILENO, "]\n", 2);
+        out_str(out, "  [backtrace error: ");
+        out_str(out, msg);
+        out_str(out, "]\n");
     }
 }
 
@@ -242,65 +1881,122 @@ static const char *safe_signame(int sig) {
     }
 }
 
-static void write_crash_header(int fd, int sig) {
-    const char *header = 
+static void write_crash_header(output_buffer_t *out, int sig) {
+    out_str(out,
         "\n================================================================\n"
         "              NATIVE CRASH REPORT (libbacktrace)\n"
-        "================================================================\n\n";
-    (void)write(fd, header, strlen(header));
+        "================================================================\n\n");
     
-    char buf[128];
     /* Use safe_signame instead of strsignal (which is NOT async-signal-safe) */
-    int len = snprintf(buf, sizeof(buf), "Signal: %d (%s)\nPID: %d\n\n",
-                       sig, safe_signame(sig), getpid());
-    if (len > 0) {
-        (void)write(fd, buf, (size_t)len);
-    }
+    out_str(out, "Signal: ");
+    out_dec(out, sig);
+    out_str(out, " (");
+    out_str(out, safe_signame(sig));
+    out_str(out, ")\nPID: ");
+    out_dec(out, (long)getpid());
+    out_str(out, "\n\n");
     
-    const char *trace_header = 
+    out_str(out,
         "Native Stack Trace:\n"
-        "------------------------------------------------------------\n";
-    (void)write(fd, trace_header, strlen(trace_header));
+        "------------------------------------------------------------\n");
 }
 
-static void write_crash_footer(int fd) {
-    const char *footer = 
+static void write_crash_footer(output_buffer_t *out) {
+    out_str(out,
         "\n------------------------------------------------------------\n"
         "Tip: Enable Python's faulthandler for Python stack traces:\n"
         "     python -X faulthandler your_script.py\n"
-        "================================================================\n\n";
-    (void)write(fd, footer, strlen(footer));
+        "================================================================\n\n");
+}
+
+/* Callback used to warm up symbol tables outside the signal handler */
+static int ignore_frame_callback(void *data, uintptr_t pc,
+                                 const char *filename, int lineno,
+                                 const char *function) {
+    (void)data;
+    (void)pc;
+    (void)filename;
+    (void)lineno;
+    (void)function;
+    return 0;
+}
+
+/*
+ * Write a crash report for the PCs in crash_trace to fd.
+ * 
+ * The raw PCs are written (and flushed) before any symbol lookup, so the
+ * essential information is out even if resolving symbols fails.
+ */
+static void write_crash_report(int fd, int sig) {
+    output_buffer_t *out = &crash_output;
+    out_init(out, fd, NULL, crash_output_data, sizeof(crash_output_data));
+    
+    write_crash_header(out, sig);
+    if (!signal_handler_state) {
+        out_str(out, "  (backtrace state not initialized)\n");
+        write_crash_footer(out);
+        out_flush(out);
+        return;
+    }
+    
+    out_str(out, "  PCs:");
+    for (int i = 0; i < crash_trace.count; i++) {
+        out_str(out, " ");
+        out_hex(out, (uintptr_t)crash_trace.pcs[i]);
+    }
+    out_str(out, "\n\n");
+    out_flush(out);
+    
+    for (int i = 0; i < crash_trace.count; i++) {
+        backtrace_pcinfo(signal_handler_state, (uintptr_t)crash_trace.pcs[i],
+                         signal_print_callback, signal_error_callback, out);
+    }
+    write_crash_footer(out);
+    out_flush(out);
 }
 
 static void crash_signal_handler(int sig) {
-    /* Write to stderr */
-    write_crash_header(STDERR_FILENO, sig);
+    pthread_t self = pthread_self();
+    if (__atomic_exchange_n(&crash_in_progress, 1, __ATOMIC_SEQ_CST)) {
+        if (pthread_equal(crash_owner, self)) {
+            /* Signalled while writing our own report: die with this signal */
+            static const char msg[] = "\nFatal signal while writing the crash report\n";
+            ssize_t rc = write(STDERR_FILENO, msg, sizeof(msg) - 1);
+            (void)rc;
+            signal(sig, SIG_DFL);
+            raise(sig);
+            return;
+        }
+        /* The buffers are shared: a second crashing thread waits to be killed */
+        for (;;) {
+            pause();
+        }
+    }
+    crash_owner = self;
+    
+    /* Capture PCs once; skip this handler and the signal trampoline */
+    crash_trace.count = 0;
     if (signal_handler_state) {
-        int fd = STDERR_FILENO;
-        backtrace_full(signal_handler_state, 2, signal_print_callback, 
-                       signal_error_callback, &fd);
-    } else {
-        const char *msg = "  (backtrace state not initialized)\n";
-        (void)write(STDERR_FILENO, msg, strlen(msg));
+        backtrace_simple(signal_handler_state, 2, simple_callback,
+                         error_callback, &crash_trace);
     }
-    write_crash_footer(STDERR_FILENO);
+    
+    /* Write to stderr */
+    write_crash_report(STDERR_FILENO, sig);
     
     /* Also write to file if configured */
     if (crash_report_path[0]) {
         int fd = open(crash_report_path, O_WRONLY | O_CREAT | O_TRUNC, 0644);
         if (fd >= 0) {
-            write_crash_header(fd, sig);
-            if (signal_handler_state) {
-                backtrace_full(signal_handler_state, 2, signal_print_callback,
-                               signal_error_callback, &fd);
-            }
-            write_crash_footer(fd);
+            write_crash_report(fd, sig);
             close(fd);
             
-            const char *saved_msg = "Crash report saved to: ";
-            (void)write(STDERR_FILENO, saved_msg, strlen(saved_msg));
-            (void)write(STDERR_FILENO, crash_report_path, strlen(crash_report_path));
-            (void)write(STDERR_FILENO, "\n", 1);
+            output_buffer_t *out = &crash_output;
+            out_init(out, STDERR_FILENO, NULL, crash_output_data, sizeof(crash_output_data));
+            out_str(out, "Crash report saved to: ");
+            out_str(out, crash_report_path);
+            out_str(out, "\n");
+            out_flush(out);
         }
     }
     
@@ -309,8 +2005,72 @@ static void crash_signal_handler(int sig) {
     raise(sig);
 }
 
-/* Track which signals we've installed handlers for */
+/*
+ * Install the alternate signal stack on the calling thread (once).
+ * Signal stacks are per thread, so this covers crashes on the thread
+ * that enabled the handler, normally the main thread. A stack that is
+ * already installed (e.g. by Python's faulthandler) is kept if it is big
+ * enough, and otherwise saved so uninstall_altstack() can put it back.
+ */
+static int install_altstack(void) {
+    if (crash_altstack) {
+        return 0;
+    }
+    
+    size_t size = SIGSTKSZ + CRASH_ALTSTACK_EXTRA;
+    stack_t current;
+    if (sigaltstack(NULL, &current) == 0 && !(current.ss_flags & SS_DISABLE)
+            && current.ss_size >= size) {
+        return 0;
+    }
+    
+    void *stack = PyMem_RawMalloc(size);
+    if (!stack) {
+        PyErr_NoMemory();
+        return -1;
+    }
+    
+    stack_t ss;
+    memset(&ss, 0, sizeof(ss));
+    ss.ss_sp = stack;
+    ss.ss_size = size;
+    if (sigaltstack(&ss, &crash_prev_altstack) != 0) {
+        PyMem_RawFree(stack);
+        PyErr_SetFromErrno(PyExc_OSError);
+        return -1;
+    }
+    
+    crash_altstack = stack;
+    return 0;
+}
+
+/*
+ * Put back the alternate stack crash_altstack replaced and free ours, if
+ * ours is still installed on this thread and not in use
+ */
+static void uninstall_altstack(void) {
+    if (!crash_altstack) {
+        return;
+    }
+    
+    stack_t current;
+    if (sigaltstack(NULL, &current) != 0 || current.ss_sp != crash_altstack
+            || (current.ss_flags & SS_ONSTACK)) {
+        /* Installed on another thread: keep it allocated */
+        return;
+    }
+    
+    stack_t prev = crash_prev_altstack;
+    prev.ss_flags &= SS_DISABLE;
+    if (sigaltstack(&prev, NULL) == 0) {
+        PyMem_RawFree(crash_altstack);
+        crash_altstack = NULL;
+    }
+}
+
+/* Track which signals we've installed handlers for, and what they replaced */
 static int installed_signals[32] = {0};
+static struct sigaction installed_prev[32];
 static int num_installed_signals = 0;
 
 /* Signal name to number mapping */
@@ -338,32 +2098,103 @@ static const signal_info_t known_signals[] = {
     {NULL, 0}
 };
 
-static int signal_name_to_num(const char *name) {
+/*
+ * Name lookup: an open-addressed table of indexes into known_signals,
+ * keyed by the FNV-1a hash of the name and built once at module init.
+ * A hit costs one hash and one strcmp to confirm.
+ */
+#define SIGNAL_TABLE_SIZE 16  /* Power of two, over twice len(known_signals) */
+
+static signed char signal_table[SIGNAL_TABLE_SIZE];
+
+static uint32_t fnv1a(const char *s) {
+    uint32_t hash = 2166136261u;
+    for (; *s; s++) {
+        hash ^= (unsigned char)*s;
+        hash *= 16777619u;
+    }
+    return hash;
+}
+
+static void init_signal_table(void) {
+    memset(signal_table, -1, sizeof(signal_table));
     for (int i = 0; known_signals[i].name != NULL; i++) {
-        if (strcmp(known_signals[i].name, name) == 0) {
-            return known_signals[i].signum;
+        uint32_t slot = fnv1a(known_signals[i].name) & (SIGNAL_TABLE_SIZE - 1);
+        while (signal_table[slot] >= 0) {
+            slot = (slot + 1) & (SIGNAL_TABLE_SIZE - 1);
+        }
+        signal_table[slot] = (signed char)i;
+    }
+}
+
+static int signal_name_to_num(const char *name) {
+    uint32_t slot = fnv1a(name) & (SIGNAL_TABLE_SIZE - 1);
+    while (signal_table[slot] >= 0) {
+        const signal_info_t *info = &known_signals[signal_table[slot]];
+        if (strcmp(info->name, name) == 0) {
+            return info->signum;
         }
+        slot = (slot + 1) & (SIGNAL_TABLE_SIZE - 1);
     }
     return -1;
 }
 
+static int signal_num_is_known(int signum) {
+    for (int i = 0; known_signals[i].name != NULL; i++) {
+        if (known_signals[i].signum == signum) {
+            return 1;
+        }
+    }
+    return 0;
+}
+
+/* Get the signal number for a name ("SIGSEGV") or number (11, signal.SIGSEGV) */
+static int signal_from_object(PyObject *item) {
+    if (PyLong_Check(item)) {
+        long signum = PyLong_AsLong(item);
+        if (signum == -1 && PyErr_Occurred()) {
+            return -1;
+        }
+        if (signum <= 0 || signum > INT_MAX || !signal_num_is_known((int)signum)) {
+            PyErr_Format(PyExc_ValueError, "unknown signal: %ld", signum);
+            return -1;
+        }
+        return (int)signum;
+    }
+    
+    if (!PyUnicode_Check(item)) {
+        PyErr_SetString(PyExc_TypeError, "signals must be names or numbers");
+        return -1;
+    }
+    const char *name = PyUnicode_AsUTF8(item);
+    if (!name) {
+        return -1;
+    }
+    int signum = signal_name_to_num(name);
+    if (signum < 0) {
+        PyErr_Format(PyExc_ValueError, "unknown signal: %s", name);
+        return -1;
+    }
+    return signum;
+}
+
 static void install_signal_handler(int signum) {
     struct sigaction sa;
     memset(&sa, 0, sizeof(sa));
     sa.sa_handler = crash_signal_handler;
     sigemptyset(&sa.sa_mask);
-    sa.sa_flags = SA_RESETHAND;  /* One-shot: reset after firing */
+    sa.sa_flags = SA_RESETHAND | SA_ONSTACK;  /* One-shot, on the alternate stack */
     
-    if (sigaction(signum, &sa, NULL) == 0) {
-        if (num_installed_signals < 32) {
-            installed_signals[num_installed_signals++] = signum;
-        }
+    if (num_installed_signals < 32
+            && sigaction(signum, &sa, &installed_prev[num_installed_signals]) == 0) {
+        installed_signals[num_installed_signals++] = signum;
     }
 }
 
+/* Restore the handlers ours replaced, newest first so repeats unwind */
 static void uninstall_signal_handlers(void) {
-    for (int i = 0; i < num_installed_signals; i++) {
-        signal(installed_signals[i], SIG_DFL);
+    for (int i = num_installed_signals - 1; i >= 0; i--) {
+        sigaction(installed_signals[i], &installed_prev[i], NULL);
     }
     num_installed_signals = 0;
 }
@@ -375,7 +2206,8 @@ static const char *default_signals[] = {"SIGSEGV", "SIGABRT", "SIGFPE", "SIGBUS"
  * enable_faulthandler(signals=None, report_path=None) -> bool
  * 
  * Install signal handlers to print native stack traces on crash.
- * signals: list of signal names (default: SIGSEGV, SIGABRT, SIGFPE, SIGBUS)
+ * signals: iterable of signal names or numbers
+ *          (default: SIGSEGV, SIGABRT, SIGFPE, SIGBUS)
  */
 static PyObject *py_enable_faulthandler(PyObject *self, PyObject *args, PyObject *kwargs) {
     (void)self;
@@ -401,6 +2233,15 @@ static PyObject *py_enable_faulthandler(PyObject *self, PyObject *args, PyObject
     /* Initialize backtrace state if needed */
     if (!signal_handler_state) {
         signal_handler_state = backtrace_create_state(NULL, 1, error_callback, NULL);
+        if (signal_handler_state) {
+            /* Load symbol tables now rather than inside the handler */
+            backtrace_pcinfo(signal_handler_state, (uintptr_t)&crash_signal_handler,
+                             ignore_frame_callback, error_callback, NULL);
+        }
+    }
+    
+    if (install_altstack() < 0) {
+        return NULL;
     }
     
     /* Install handlers for specified signals */
@@ -422,24 +2263,14 @@ static PyObject *py_enable_faulthandler(PyObject *self, PyObject *args, PyObject
         
         PyObject *item;
         while ((item = PyIter_Next(iter)) != NULL) {
-            const char *name = PyUnicode_AsUTF8(item);
-            if (!name) {
-                Py_DECREF(item);
-                Py_DECREF(iter);
-                PyErr_SetString(PyExc_TypeError, "signal names must be strings");
-                return NULL;
-            }
-            
-            int signum = signal_name_to_num(name);
+            int signum = signal_from_object(item);
+            Py_DECREF(item);
             if (signum < 0) {
-                Py_DECREF(item);
                 Py_DECREF(iter);
-                PyErr_Format(PyExc_ValueError, "unknown signal: %s", name);
                 return NULL;
             }
             
             install_signal_handler(signum);
-            Py_DECREF(item);
         }
         Py_DECREF(iter);
         
@@ -456,13 +2287,15 @@ static PyObject *py_enable_faulthandler(PyObject *self, PyObject *args, PyObject
 /*
  * disable_faulthandler() -> bool
  * 
- * Remove signal handlers and restore defaults.
+ * Remove signal handlers, restoring the handlers and alternate stack
+ * they replaced.
  */
 static PyObject *py_disable_faulthandler(PyObject *self, PyObject *args) {
     (void)self;
     (void)args;
     
     uninstall_signal_handlers();
+    uninstall_altstack();
     signal_handler_enabled = 0;
     crash_report_path[0] = '\0';
     
@@ -542,27 +2375,100 @@ static PyMethodDef module_methods[] = {
      "Create a new backtrace state.\n\n"
      "Args:\n"
      "    filename: Path to executable (None for current process)\n"
-     "    threaded: Whether to support multi-threaded access\n\n"
+     "    threaded: Whether to support multi-threaded access\n"
+     "    unwinder: \"dwarf\" (default) or \"fp\" to walk frame pointers\n\n"
      "Returns:\n"
      "    State object"},
+    {"_state_id", py_state_id, METH_VARARGS,
+     "Return an int identifying a State's underlying libbacktrace state."},
+    {"_module_table_loads", py_module_table_loads, METH_NOARGS,
+     "Return how many module tables have been read from the loader."},
+    {"refresh_modules", py_refresh_modules, METH_VARARGS,
+     "Pick up shared libraries loaded since the state read its modules.\n\n"
+     "Args:\n"
+     "    state: State object from create_state()\n\n"
+     "Returns:\n"
+     "    True if the module list changed and the state was replaced\n\n"
+     "The replaced state cannot be freed, so each refresh keeps its memory."},
+    {"prewarm", py_prewarm, METH_VARARGS,
+     "Load debug information for the code of every loaded module.\n\n"
+     "Call before fork() so child processes share the populated state.\n\n"
+     "Args:\n"
+     "    state: State object from create_state()\n\n"
+     "Returns:\n"
+     "    Number of module code ranges visited"},
     {"backtrace_full", py_backtrace_full, METH_VARARGS,
      "Get a full backtrace with symbol information.\n\n"
      "Args:\n"
      "    state: State object from create_state()\n"
      "    skip: Number of frames to skip\n\n"
      "Returns:\n"
-     "    List of (pc, function, filename, lineno) tuples"},
+     "    List of BacktraceFrame objects"},
+    {"backtrace_simple", py_backtrace_simple, METH_VARARGS,
+     "Get a backtrace of program counters without symbol lookup.\n\n"
+     "Args:\n"
+     "    state: State object from create_state()\n"
+     "    skip: Number of frames to skip\n\n"
+     "Returns:\n"
+     "    bytes holding one native-endian uint64 per frame"},
+    {"backtrace_simple_into", py_backtrace_simple_into, METH_VARARGS,
+     "Write a backtrace of program counters into a caller-provided buffer.\n\n"
+     "Nothing is allocated, so this suits periodic sampling; resolve the\n"
+     "collected PCs later with resolve_batch().\n\n"
+     "Args:\n"
+     "    state: State object from create_state()\n"
+     "    skip: Number of frames to skip\n"
+     "    buf: Writable buffer of native-endian uint64, e.g. array('Q')\n\n"
+     "Returns:\n"
+     "    Number of frames written; remaining slots are zeroed"},
+    {"resolve", py_resolve, METH_VARARGS,
+     "Resolve program counters to symbol information.\n\n"
+     "Args:\n"
+     "    state: State object from create_state()\n"
+     "    pcs: Buffer of uint64 program counters (e.g. array('Q'))\n\n"
+     "Returns:\n"
+     "    (pcs, functions, filenames, linenos) column tuple; pcs is an\n"
+     "    array('Q') and linenos an array('i')"},
+    {"resolve_batch", py_resolve_batch, METH_VARARGS,
+     "Resolve many program counters at once.\n\n"
+     "PCs are sorted and de-duplicated before lookup; results are\n"
+     "returned in input order.\n\n"
+     "Args:\n"
+     "    state: State object from create_state()\n"
+     "    pcs: Buffer of uint64 program counters (e.g. array('Q'))\n\n"
+     "Returns:\n"
+     "    List with one tuple of BacktraceFrame objects per PC"},
+    {"format_backtrace", py_format_backtrace, METH_VARARGS,
+     "Write a full backtrace to a file descriptor.\n\n"
+     "Frames are formatted as print_backtrace() does and written with\n"
+     "as few write() calls as possible.\n\n"
+     "Args:\n"
+     "    state: State object from create_state()\n"
+     "    skip: Number of frames to skip\n"
+     "    fd: File descriptor to write to\n\n"
+     "Returns:\n"
+     "    Number of frames written"},
+    {"format_backtrace_into", py_format_backtrace_into, METH_VARARGS,
+     "Write a formatted full backtrace into a bytearray.\n\n"
+     "Text is written from offset 0; the bytearray grows if needed but is\n"
+     "never shrunk, so it can be reused across calls.\n\n"
+     "Args:\n"
+     "    state: State object from create_state()\n"
+     "    skip: Number of frames to skip\n"
+     "    buf: bytearray to write into\n\n"
+     "Returns:\n"
+     "    Number of bytes written"},
     {"enable_faulthandler", (PyCFunction)py_enable_faulthandler, 
      METH_VARARGS | METH_KEYWORDS,
      "Enable native crash handler.\n\n"
      "Installs signal handlers to print native stack traces on crash.\n\n"
      "Args:\n"
-     "    signals: List of signal names (default: SIGSEGV, SIGABRT, SIGFPE, SIGBUS)\n"
+     "    signals: Signal names or numbers (default: SIGSEGV, SIGABRT, SIGFPE, SIGBUS)\n"
      "    report_path: Optional file path to save crash reports\n\n"
      "Returns:\n"
      "    True on success"},
     {"disable_faulthandler", py_disable_faulthandler, METH_NOARGS,
-     "Disable native crash handler and restore default signal handlers."},
+     "Disable native crash handler and restore the previous signal handlers."},
     {"faulthandler_enabled", py_faulthandler_enabled, METH_NOARGS,
      "Check if native crash handler is currently enabled."},
     {"get_signals", py_get_signals, METH_NOARGS,
@@ -582,11 +2488,40 @@ static struct PyModuleDef moduledef = {
 };
 
 PyMODINIT_FUNC PyInit__libbacktrace(void) {
-    /* Initialize State type */
-    if (PyType_Ready(&StateType) < 0) {
+    /* Initialize types */
+    if (PyType_Ready(&StateType) < 0 || PyType_Ready(&FrameType) < 0) {
+        return NULL;
+    }
+    
+    /* Positional patterns match the fields in constructor order */
+    PyObject *match_args = Py_BuildValue("(ssss)", "pc", "function", "filename", "lineno");
+    if (!match_args || PyDict_SetItemString(FrameType.tp_dict, "__match_args__", match_args) < 0) {
+        Py_XDECREF(match_args);
+        return NULL;
+    }
+    Py_DECREF(match_args);
+    PyType_Modified(&FrameType);
+    
+    /* Column units for frames_to_columns() */
+    PyObject *array_module = PyImport_ImportModule("array");
+    if (!array_module) {
+        return NULL;
+    }
+    pc_column_unit = PyObject_CallMethod(array_module, "array", "s[i]", "Q", 0);
+    lineno_column_unit = PyObject_CallMethod(array_module, "array", "s[i]", "i", 0);
+    Py_DECREF(array_module);
+    if (!pc_column_unit || !lineno_column_unit) {
         return NULL;
     }
     
+    init_signal_table();
+    
+#if defined(__APPLE__)
+    /* Also called once for every image already loaded */
+    _dyld_register_func_for_add_image(dyld_image_changed);
+    _dyld_register_func_for_remove_image(dyld_image_changed);
+#endif
+    
     PyObject *module = PyModule_Create(&moduledef);
     if (!module) {
         return NULL;
@@ -606,5 +2541,13 @@ PyMODINIT_FUNC PyInit__libbacktrace(void) {
         return NULL;
     }
     
+    /* Add BacktraceFrame type */
+    Py_INCREF(&FrameType);
+    if (PyModule_AddObject(module, "BacktraceFrame", (PyObject *)&FrameType) < 0) {
+        Py_DECREF(&FrameType);
+        Py_DECREF(module);
+        return NULL;
+    }
+    
     return module;
 }
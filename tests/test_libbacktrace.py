@@ -67,6 +67,20 @@ def test_backtrace_has_function_names():
     assert isinstance(frames, list)
 
 
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_get_backtrace_first_frame():
+    """Test that get_backtrace() starts at the interpreter, not the call machinery."""
+    import platform
+    import libbacktrace
+    
+    frames = libbacktrace.get_backtrace()
+    if platform.python_implementation() != "CPython" or not frames or not frames[0].function:
+        pytest.skip("interpreter symbols not available")
+    assert frames[0].function.startswith("_PyEval_EvalFrame")
+    assert libbacktrace.get_backtrace_pcs()[0] == frames[0].pc
+
+
 @pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
                     reason="Only supported on Linux and macOS")
 def test_create_state():
@@ -80,6 +94,362 @@ def test_create_state():
     assert isinstance(frames, list)
 
 
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_prewarm():
+    """Test prewarming a state with every loaded module."""
+    import libbacktrace
+    
+    state = libbacktrace.create_state()
+    assert state.prewarm() > 0
+    assert len(state.get_backtrace()) > 0
+
+
+@pytest.mark.skipif(sys.platform != 'linux', reason="Reads /proc/self/statm")
+def test_prewarm_loads_every_unit():
+    """Test that lookups after prewarm() need no more debug information."""
+    import ctypes
+    import os
+    from array import array
+    import libbacktrace
+    
+    def rss():
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    
+    # Functions from many compilation units of the interpreter
+    names = ["PyList_New", "PyDict_New", "PyObject_GetAttr", "PyLong_FromLong",
+             "PyUnicode_FromString", "PyTuple_New", "PyErr_SetString",
+             "PyImport_ImportModule", "PyFloat_FromDouble", "PySet_New",
+             "PyBytes_FromStringAndSize", "PyNumber_Add", "PyGC_Collect",
+             "PyMarshal_ReadObjectFromString", "PyCodec_Encode", "PySys_GetObject"]
+    pcs = array('Q', [ctypes.cast(getattr(ctypes.pythonapi, name), ctypes.c_void_p).value
+                      for name in names])
+    
+    state = libbacktrace.create_state(sys.executable)
+    state.prewarm()
+    if state.resolve(pcs[:1])[0].function is None:
+        pytest.skip("interpreter has no debug information")
+    before = rss()
+    state.resolve(pcs[1:])
+    assert rss() - before < 1 << 20
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_refresh_modules():
+    """Test that a state notices shared libraries loaded after it."""
+    import importlib
+    import importlib.util
+    import libbacktrace
+    
+    state = libbacktrace.create_state()
+    state._refresh_modules()  # A pooled state may predate recent imports
+    assert state._refresh_modules() is False
+    
+    for name in ("_lzma", "_bz2", "_decimal", "_testcapi", "_curses"):
+        spec = importlib.util.find_spec(name)
+        if name not in sys.modules and spec and (spec.origin or "").endswith(".so"):
+            importlib.import_module(name)
+            break
+    else:
+        pytest.skip("no unloaded extension module to import")
+    
+    assert state._refresh_modules() is True
+    assert state._refresh_modules() is False
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_unknown_pc_does_not_reload_modules():
+    """Test that a PC outside every module only reloads after dlopen."""
+    import ctypes
+    from array import array
+    import libbacktrace
+    from libbacktrace import _libbacktrace
+    
+    # A heap address, like JIT code, belongs to no module
+    buf = ctypes.create_string_buffer(64)
+    pcs = array('Q', [ctypes.addressof(buf)])
+    state = libbacktrace.create_state()
+    assert state.resolve(pcs)[0].function is None
+    
+    loads = _libbacktrace._module_table_loads()
+    for _ in range(100):
+        state.resolve(pcs)
+    assert _libbacktrace._module_table_loads() == loads
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_refresh_on_lookup():
+    """Test that resolving a PC in a library loaded late refreshes the state."""
+    import ctypes
+    import importlib.util
+    from array import array
+    import libbacktrace
+    
+    state = libbacktrace.create_state()
+    assert len(state.get_backtrace()) > 0
+    
+    spec = importlib.util.find_spec("_ctypes_test")
+    if "_ctypes_test" in sys.modules or not spec or not (spec.origin or "").endswith(".so"):
+        pytest.skip("_ctypes_test not available as an unloaded shared library")
+    
+    lib = ctypes.CDLL(spec.origin)
+    pcs = array('Q', [ctypes.cast(lib._testfunc_i_bhilfd, ctypes.c_void_p).value])
+    if libbacktrace.create_state().resolve(pcs)[0].function is None:
+        pytest.skip("_ctypes_test has no debug information")
+    
+    assert state.resolve(pcs)[0].function == "_testfunc_i_bhilfd"
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_fp_unwinder():
+    """Test the frame-pointer unwinder option."""
+    import platform
+    import libbacktrace
+    
+    if platform.machine() not in ('x86_64', 'AMD64', 'aarch64', 'arm64'):
+        pytest.skip("frame-pointer unwinder not available")
+    
+    state = libbacktrace.create_state(unwinder="fp")
+    # Falls back to DWARF if the interpreter omits frame pointers
+    frames = state.get_backtrace()
+    assert len(frames) > 0
+    assert all(f.pc > 0 for f in frames)
+    assert len(state.capture().frames()) > 0
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_fp_unwinder_matches_dwarf():
+    """Test that the frame-pointer walk agrees with DWARF unwinding."""
+    import platform
+    from array import array
+    import libbacktrace
+    from libbacktrace import _libbacktrace
+    
+    if platform.machine() not in ('x86_64', 'AMD64', 'aarch64', 'arm64'):
+        pytest.skip("frame-pointer unwinder not available")
+    
+    fp = libbacktrace.create_state(unwinder="fp")
+    dwarf = libbacktrace.create_state(unwinder="dwarf")
+    # skip=-1 keeps the binding's own frame, which has a frame pointer even
+    # when the interpreter does not, so the walker itself is exercised
+    fp_pcs = array('Q', _libbacktrace.backtrace_simple(fp._state, -1))
+    dwarf_pcs = array('Q', _libbacktrace.backtrace_simple(dwarf._state, -1))
+    assert len(fp_pcs) >= 2
+    assert fp_pcs[:2] == dwarf_pcs[:2]
+
+
+def test_unknown_unwinder():
+    """Test that an unknown unwinder name is rejected."""
+    import libbacktrace
+    
+    if not libbacktrace.supported():
+        pytest.skip("native extension not available")
+    with pytest.raises(ValueError):
+        libbacktrace.create_state(unwinder="bogus")
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_default_state_per_thread():
+    """Test that each thread gets its own default state."""
+    import threading
+    import libbacktrace
+    
+    main_state = libbacktrace._get_default_state()
+    assert libbacktrace._get_default_state() is main_state
+    
+    other = []
+    thread = threading.Thread(
+        target=lambda: other.append((libbacktrace._get_default_state(),
+                                     libbacktrace.get_backtrace()))
+    )
+    thread.start()
+    thread.join()
+    
+    state, frames = other[0]
+    assert state is not main_state
+    assert isinstance(frames, list)
+    
+    shared = libbacktrace.create_shared_state()
+    assert isinstance(shared.get_backtrace(), list)
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_default_states_reused_across_threads():
+    """Test that short-lived threads reuse a bounded number of states."""
+    import threading
+    import libbacktrace
+    from libbacktrace import _libbacktrace
+    
+    ids = []
+    
+    def work():
+        libbacktrace.get_backtrace()
+        ids.append(_libbacktrace._state_id(libbacktrace._get_default_state()._state))
+    
+    for _ in range(8):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    
+    assert len(set(ids)) <= 2
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_single_threaded_state_shared_by_threads():
+    """Test that threads sharing a threaded=False state resolve correctly."""
+    import threading
+    import libbacktrace
+    
+    # Lookups drop the GIL, so the state's own lock must keep them apart
+    state = libbacktrace.create_state(threaded=False)
+    pcs = state.capture().pcs
+    expected = [f.function for f in state.resolve(pcs)]
+    results = []
+    
+    def work():
+        for _ in range(20):
+            results.append([f.function for f in state.resolve(pcs)])
+    
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(results) == 160
+    assert all(r == expected for r in results)
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_capture_deferred():
+    """Test capturing PCs and resolving symbols on demand."""
+    import libbacktrace
+    from array import array
+    
+    state = libbacktrace.create_state()
+    trace = state.capture()
+    assert isinstance(trace, libbacktrace.RawBacktrace)
+    assert isinstance(trace.pcs, array)
+    assert trace.pcs.typecode == 'Q'
+    
+    resolved = trace.resolve()
+    assert isinstance(resolved, libbacktrace.Backtrace)
+    # Resolution happens once and is cached
+    assert trace.resolve() is resolved
+    
+    frames = trace.frames()
+    assert isinstance(frames, list)
+    assert list(trace) == frames
+    
+    if trace.pcs:
+        assert len(frames) >= 1
+        assert frames[0].pc == trace.pcs[0]
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_backtrace_columns():
+    """Test the column-wise Backtrace container."""
+    import libbacktrace
+    from array import array
+    
+    bt = libbacktrace.create_state().capture().resolve()
+    assert isinstance(bt.pcs, array) and bt.pcs.typecode == 'Q'
+    assert isinstance(bt.linenos, array) and bt.linenos.typecode == 'i'
+    assert len(bt) == len(bt.pcs) == len(bt.functions) == len(bt.filenames) == len(bt.linenos)
+    
+    for i, frame in enumerate(bt):
+        assert frame == bt[i]
+        assert frame.pc == bt.pcs[i]
+        assert frame.function == bt.functions[i]
+        assert frame.filename == bt.filenames[i]
+        assert frame.lineno == bt.linenos[i]
+    
+    tail = bt[1:]
+    assert isinstance(tail, libbacktrace.Backtrace)
+    assert list(tail) == list(bt)[1:]
+    assert list(bt[::-1]) == list(reversed(list(bt)))
+    
+    empty = libbacktrace.create_state().resolve(array('Q'))
+    assert len(empty) == 0
+    assert empty.pcs == array('Q') and empty.linenos == array('i')
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_get_backtrace_pcs():
+    """Test capturing PCs into a caller-provided buffer."""
+    import libbacktrace
+    from array import array
+    
+    pcs = libbacktrace.get_backtrace_pcs()
+    assert pcs.typecode == 'Q'
+    
+    out = array('Q', [1]) * 256
+    assert libbacktrace.get_backtrace_pcs(out=out) is out
+    count = libbacktrace.create_state().capture_into(out)
+    assert 0 not in out[:count]
+    assert not any(out[count:])
+    
+    with pytest.raises(ValueError):
+        libbacktrace.get_backtrace_pcs(out=bytearray(7))
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_resolve_batch():
+    """Test batch resolution of PCs from several traces."""
+    import libbacktrace
+    from array import array
+    
+    state = libbacktrace.create_state()
+    first = state.capture()
+    second = state.capture()
+    pcs = array('Q', first.pcs)
+    pcs.extend(second.pcs)
+    pcs.extend(reversed(first.pcs))
+    
+    results = state.resolve_batch(pcs)
+    assert len(results) == len(pcs)
+    for pc, frames in zip(pcs, results):
+        assert isinstance(frames, tuple)
+        assert all(f.pc == pc for f in frames)
+    
+    if first.pcs:
+        # Repeated PCs share one result
+        assert results[0] is results[len(pcs) - 1]
+        assert list(results[0]) == list(state.resolve(first.pcs[:1]))
+    
+    assert state.resolve_batch(array('Q')) == []
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_names_are_shared():
+    """Test that repeated names from one state are the same str object."""
+    import libbacktrace
+    
+    state = libbacktrace.create_state()
+    trace = state.capture()
+    first = state.resolve(trace.pcs)
+    second = state.resolve(trace.pcs)
+    
+    for a, b in zip(first.functions + first.filenames,
+                    second.functions + second.filenames):
+        if a is not None:
+            assert a is b
+
+
 @pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
                     reason="Only supported on Linux and macOS")
 def test_skip_frames():
@@ -112,6 +482,74 @@ def test_print_backtrace(capsys):
     assert len(captured.err) > 0
 
 
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_print_backtrace_without_stderr(monkeypatch, capsys):
+    """Test print_backtrace() is a no-op when sys.stderr is None."""
+    import libbacktrace
+    
+    monkeypatch.setattr(sys, "stderr", None)
+    libbacktrace.print_backtrace()
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_print_backtrace_to_fd(tmp_path):
+    """Test printing a backtrace to a real file descriptor."""
+    import libbacktrace
+    
+    path = tmp_path / "trace.txt"
+    with open(path, "w") as f:
+        f.write("before\n")
+        libbacktrace.print_backtrace(file=f)
+        f.write("after\n")
+    
+    lines = path.read_text().splitlines()
+    assert lines[0] == "before"
+    assert lines[-1] == "after"
+    assert len(lines) > 2
+    assert all(line.startswith("  #") for line in lines[1:-1])
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_print_backtrace_reuses_buffer():
+    """Test that print_backtrace() to a text stream reuses one buffer."""
+    import io
+    import libbacktrace
+    
+    first = io.StringIO()
+    libbacktrace.print_backtrace(file=first)
+    buf = libbacktrace._tls.buf
+    second = io.StringIO()
+    libbacktrace.print_backtrace(file=second)
+    assert libbacktrace._tls.buf is buf
+    assert second.getvalue().startswith("  #0 ")
+    assert second.getvalue().count("\n") == first.getvalue().count("\n")
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_print_backtrace_first_frame(tmp_path):
+    """Test that both output paths start at the same, interpreter frame."""
+    import io
+    import platform
+    import libbacktrace
+    
+    text = io.StringIO()
+    libbacktrace.print_backtrace(file=text)
+    path = tmp_path / "trace.txt"
+    with open(path, "w") as f:
+        libbacktrace.print_backtrace(file=f)
+    
+    first = text.getvalue().splitlines()[0]
+    assert first.split(" at ")[0] == path.read_text().splitlines()[0].split(" at ")[0]
+    if platform.python_implementation() != "CPython" or first.startswith("  #0 ??"):
+        pytest.skip("interpreter symbols not available")
+    assert first.startswith("  #0 _PyEval_EvalFrame")
+
+
 def test_unsupported_platform_graceful():
     """Test that unsupported platforms fail gracefully."""
     import libbacktrace
@@ -148,6 +586,99 @@ def test_frame_str():
     assert "??" in s
 
 
+def test_frame_equality():
+    """Test BacktraceFrame comparison and repr."""
+    from libbacktrace import BacktraceFrame
+    
+    a = BacktraceFrame(pc=1, function="f", filename="a.c", lineno=2)
+    b = BacktraceFrame(1, "f", "a.c", 2)
+    assert a == b
+    assert a != BacktraceFrame(pc=1, function="g", filename="a.c", lineno=2)
+    assert "function='f'" in repr(a)
+
+
+def test_frame_gc():
+    """Test that frames in reference cycles are collected."""
+    import gc
+    import weakref
+    import libbacktrace
+    from libbacktrace import BacktraceFrame
+    
+    class Holder:
+        pass
+    
+    frame = BacktraceFrame(pc=1, function="f", filename="a.c", lineno=2)
+    holder = Holder()
+    frame.function = holder
+    holder.frame = frame
+    ref = weakref.ref(holder)
+    del frame, holder
+    gc.collect()
+    assert ref() is None
+    
+    # The C type stores pc as an unsigned 64-bit value
+    if libbacktrace.supported():
+        with pytest.raises(OverflowError):
+            BacktraceFrame(pc=-1, function=None, filename=None, lineno=0)
+
+
+def test_frame_pickle_and_copy():
+    """Test that frames survive pickling and copying."""
+    import copy
+    import pickle
+    from libbacktrace import BacktraceFrame
+    
+    frame = BacktraceFrame(pc=0x10, function="f", filename="a.c", lineno=2)
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        clone = pickle.loads(pickle.dumps(frame, protocol))
+        assert type(clone) is BacktraceFrame
+        assert clone == frame
+    assert copy.copy(frame) == frame
+    assert copy.deepcopy(frame) == frame
+    assert copy.copy(frame) is not frame
+    
+    unknown = BacktraceFrame(pc=1, function=None, filename=None, lineno=0)
+    assert pickle.loads(pickle.dumps(unknown)) == unknown
+    assert BacktraceFrame.__match_args__ == ("pc", "function", "filename", "lineno")
+
+
+def test_frame_format_into():
+    """Test that format_into appends the same text as str()."""
+    from libbacktrace import BacktraceFrame
+    
+    buf = bytearray(b"> ")
+    frame = BacktraceFrame(pc=0x10, function="f", filename="a.c", lineno=2)
+    assert frame.format_into(buf) is buf
+    assert buf == b"> f at a.c:2"
+    
+    frame = BacktraceFrame(pc=0x10, function=None, filename=None, lineno=0)
+    assert frame.format_into(bytearray()).decode() == str(frame)
+
+
+def test_frame_reuse():
+    """Test that recycled frames never leak values from earlier frames."""
+    from libbacktrace import BacktraceFrame
+    
+    for i in range(1000):
+        frame = BacktraceFrame(pc=i, function=None, filename=None, lineno=0)
+        assert frame.function is None
+        assert frame.filename is None
+        assert frame.pc == i
+        frame = BacktraceFrame(pc=i, function="f", filename="a.c", lineno=i)
+        assert frame.lineno == i
+        del frame
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_backtrace_returns_frame_objects():
+    """Test that get_backtrace returns BacktraceFrame instances."""
+    import libbacktrace
+    
+    frames = libbacktrace.create_state().get_backtrace()
+    assert all(isinstance(f, libbacktrace.BacktraceFrame) for f in frames)
+
+
 # =============================================================================
 # Faulthandler tests
 # =============================================================================
@@ -209,6 +740,107 @@ def test_faulthandler_custom_signals():
     libbacktrace.disable_faulthandler()
 
 
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_faulthandler_crash_report(tmp_path):
+    """Test the report written when a crash actually happens."""
+    import subprocess
+    
+    report_file = tmp_path / "crash_report.txt"
+    code = (
+        "import ctypes, libbacktrace\n"
+        f"libbacktrace.enable_faulthandler(report_path={str(report_file)!r})\n"
+        "ctypes.string_at(0)\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    
+    assert proc.returncode != 0
+    assert "NATIVE CRASH REPORT" in proc.stderr
+    assert "SIGSEGV" in proc.stderr
+    assert "PCs: 0x" in proc.stderr
+    assert "PCs: 0x" in report_file.read_text()
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_faulthandler_restores_python_faulthandler():
+    """Test that disabling hands crashes back to Python's faulthandler."""
+    import faulthandler
+    import subprocess
+    
+    if not hasattr(faulthandler, "_stack_overflow"):
+        pytest.skip("faulthandler._stack_overflow not available")
+    
+    code = (
+        "import faulthandler, libbacktrace\n"
+        "faulthandler.enable()\n"
+        "libbacktrace.enable_faulthandler()\n"
+        "libbacktrace.disable_faulthandler()\n"
+        "faulthandler._stack_overflow()\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                          text=True, timeout=60)
+    
+    assert proc.returncode != 0
+    assert "Fatal Python error: Segmentation fault" in proc.stderr
+    assert "NATIVE CRASH REPORT" not in proc.stderr
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_faulthandler_nested_signal(tmp_path):
+    """Test that a signal arriving mid-report ends the process."""
+    import os
+    import signal
+    import subprocess
+    
+    # Opening a FIFO with no reader blocks the handler after the stderr report
+    fifo = tmp_path / "report.fifo"
+    os.mkfifo(fifo)
+    code = (
+        "import ctypes, libbacktrace\n"
+        f"libbacktrace.enable_faulthandler(report_path={str(fifo)!r})\n"
+        "ctypes.string_at(0)\n"
+    )
+    proc = subprocess.Popen([sys.executable, "-c", code], stderr=subprocess.PIPE, text=True)
+    try:
+        # Wait for the stderr report's footer, the third "====" rule
+        lines = []
+        for line in proc.stderr:
+            lines.append(line)
+            if sum(x.startswith("====") for x in lines) == 3:
+                break
+        proc.send_signal(signal.SIGABRT)
+        returncode = proc.wait(timeout=30)
+        stderr = "".join(lines) + proc.stderr.read()
+    finally:
+        proc.kill()
+        proc.stderr.close()
+    
+    assert returncode == -signal.SIGABRT
+    assert stderr.count("NATIVE CRASH REPORT") == 1
+    assert "Fatal signal while writing the crash report" in stderr
+
+
+@pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
+                    reason="Only supported on Linux and macOS")
+def test_faulthandler_signal_numbers():
+    """Test enabling faulthandler with signal numbers and invalid signals."""
+    import signal
+    import libbacktrace
+    
+    try:
+        assert libbacktrace.enable_faulthandler(signals=[signal.SIGSEGV, int(signal.SIGABRT), "SIGFPE"])
+        with pytest.raises(ValueError):
+            libbacktrace.enable_faulthandler(signals=["SIGNOPE"])
+        with pytest.raises(ValueError):
+            libbacktrace.enable_faulthandler(signals=[signal.SIGINT])
+        with pytest.raises(TypeError):
+            libbacktrace.enable_faulthandler(signals=[1.5])
+    finally:
+        libbacktrace.disable_faulthandler()
+
+
 @pytest.mark.skipif(sys.platform not in ('linux', 'darwin'),
                     reason="Only supported on Linux and macOS")
 def test_get_signals():